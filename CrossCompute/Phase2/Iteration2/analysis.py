@@ -0,0 +1,116 @@
+import numpy as np
+from maze import WALL, WEIGHTED
+
+CHUNK_CELLS = 2**20 # Number of cells analyzed at a time, so the temporary arrays of a pass stay small
+LISTED_POINTS = 10 # Most points listed in a validation error, the rest are counted
+
+###
+
+class MazeSummary:
+    """
+    What one pass over a maze finds out about it, for validation and drawing to share instead of scanning the grid again.
+    :param shape: (rows, cols) of the maze.
+    :param kindCounts: Number of cells of each kind, indexed by EMPTY, WALL, START, END and WEIGHTED.
+    :param starts (list): (row, col) of every start point, in row-major order.
+    :param ends (list): (row, col) of every end point, in row-major order.
+    :param raggedRows (list): (line number, cell count) of every CSV row that did not have as many cells as the first row.
+    :param weightHistogram (dict): weight -> number of weighted cells with that weight.
+    :param boundingBox: (top, left, bottom, right) of the cells that are not walls, bottom and right not included,
+    or None if every cell is a wall.
+    """
+    def __init__(self, shape, kindCounts, starts, ends, raggedRows, weightHistogram, boundingBox):
+        self.shape = tuple(shape)
+        self.kindCounts = kindCounts
+        self.starts = starts
+        self.ends = ends
+        self.raggedRows = raggedRows
+        self.weightHistogram = weightHistogram
+        self.boundingBox = boundingBox
+
+    @property
+    def wallCount(self):
+        return int(self.kindCounts[WALL])
+
+    def minAndMax(self, maze=None, pathMask=None):
+        """
+        The minimum and maximum weight of the weighted cells that are drawn brown, the same as render.getMinAndMax.
+        Weighted cells on the path are drawn as path cells, so they are left out.
+        :param maze (Maze): The maze, only needed with a pathMask.
+        :param pathMask: Optional boolean grid of path cells.
+        :return: (min, max), or (0, 0) if there are no such cells
+        """
+        counts = {weight: count for weight, count in self.weightHistogram.items() if weight > 1}
+        if pathMask is not None and counts:
+            onPath = np.flatnonzero(pathMask)
+            onPath = onPath[maze.kinds.ravel()[onPath] == WEIGHTED]
+            for weight in maze.weights.ravel()[onPath].tolist():
+                if weight in counts:
+                    counts[weight] -= 1
+            counts = {weight: count for weight, count in counts.items() if count > 0}
+        if not counts:
+            return 0,0
+        return min(counts),max(counts)
+
+    def validationErrors(self, query="single", goals=None):
+        """
+        Checks the rules of run.validateMaze.
+        :param query (str): "single", "each" or "nearest", see run.validateMaze.
+        :param goals (list): Optional ((row, col), name) of every goal from a goal list, which are used instead of the end points.
+        :return: list of (message, points), where points lists the (row, col) of the cells the error is about
+        """
+        rows, cols = self.shape
+        errors = []
+        for lineNumber, cellCount in self.raggedRows:
+            errors.append(("Row on line " + str(lineNumber) + " has " + str(cellCount) + " cells instead of " + str(cols) + ".", []))
+        startCount = len(self.starts)
+        endCount = len(self.ends) if goals is None else len(goals)
+        if startCount == 0 or endCount == 0:
+            errors.append(("There must be a start and end point.", []))
+        if startCount > 1 and query != "nearest":
+            errors.append(("There can be no more than one start point, found " + str(startCount) + " at " + listPoints(self.starts) + ".", self.starts))
+        if endCount > 1 and query == "single":
+            errors.append(("There can be no more than one end point, found " + str(endCount) + " at " + listPoints(self.ends) + ".", self.ends))
+        for (row, col), name in goals or []:
+            if not (0 <= row < rows and 0 <= col < cols):
+                errors.append(("Goal " + name + " at (" + str(row) + "," + str(col) + ") is outside of the maze.", [(row, col)]))
+        return errors
+
+def listPoints(points):
+    """
+    Lists up to LISTED_POINTS points as "(row,col)" text.
+    """
+    text = ", ".join("(" + str(row) + "," + str(col) + ")" for row, col in points[:LISTED_POINTS])
+    if len(points) > LISTED_POINTS:
+        text += " and " + str(len(points) - LISTED_POINTS) + " more"
+    return text
+
+def analyzeMaze(maze, chunkCells=CHUNK_CELLS):
+    """
+    Counts the cells of each kind, the weights and the extent of the open cells of a maze in one pass over its grids,
+    a block of rows at a time with array operations. The start and end points are the ones the maze was read with.
+    :param maze (Maze): The maze to analyze.
+    :param chunkCells (int): Number of cells analyzed at a time.
+    :return: MazeSummary
+    """
+    rows, cols = maze.shape
+    kindCounts = np.zeros(WEIGHTED + 1, dtype=np.int64)
+    weightHistogram = dict()
+    openRows = np.zeros(rows, dtype=bool)
+    openCols = np.zeros(cols, dtype=bool)
+    chunkRows = max(1, chunkCells // max(cols, 1))
+    for top in range(0, rows, chunkRows):
+        kinds = np.asarray(maze.kinds[top:top+chunkRows])
+        kindCounts += np.bincount(kinds.ravel(), minlength=WEIGHTED + 1)[:WEIGHTED + 1]
+        weighted = kinds == WEIGHTED
+        if weighted.any():
+            weights, counts = np.unique(maze.weights[top:top+chunkRows][weighted], return_counts=True)
+            for weight, count in zip(weights.tolist(), counts.tolist()):
+                weightHistogram[weight] = weightHistogram.get(weight, 0) + count
+        passable = kinds != WALL
+        openRows[top:top+chunkRows] = passable.any(axis=1)
+        openCols |= passable.any(axis=0)
+    boundingBox = None
+    if openRows.any():
+        rowIndexes, colIndexes = np.flatnonzero(openRows), np.flatnonzero(openCols)
+        boundingBox = (int(rowIndexes[0]), int(colIndexes[0]), int(rowIndexes[-1]) + 1, int(colIndexes[-1]) + 1)
+    return MazeSummary((rows, cols), kindCounts, maze.starts, maze.ends, maze.raggedRows, weightHistogram, boundingBox)
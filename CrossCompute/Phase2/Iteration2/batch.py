@@ -0,0 +1,170 @@
+import argparse
+import importlib
+import os
+from os.path import dirname, isdir, isfile, join
+from multiprocessing.connection import wait
+from time import perf_counter
+import run
+import parallel
+
+SUMMARY_NAME = "batchSummary.json"
+
+###
+
+def batchesFromConfig(configFile):
+    """
+    Lists the batch folders of an automate.yml, e.g. "- folder: batches/example1" under "batches:".
+    Each batch reads input/data.csv and writes to output/, the same as CrossCompute.
+    :param configFile: Path to automate.yml.
+    :return: list of (name, maze file, output folder)
+    """
+    root = dirname(os.path.abspath(configFile))
+    batches = []
+    inBatches = False
+    with open(configFile) as file:
+        for line in file:
+            stripped = line.strip()
+            if not line.startswith((" ", "\t", "-")) and stripped and not stripped.startswith("#"):
+                inBatches = stripped == "batches:" # a new top level section starts
+            elif inBatches and stripped.startswith("- folder:"):
+                folder = stripped[len("- folder:"):].strip().strip("'\"")
+                batches.append((folder, run.findMazeFile(join(root, folder, "input")), join(root, folder, "output")))
+    return batches
+
+def batchesFromFolder(inputFolder, outputFolder):
+    """
+    Lists the mazes in a folder: every .csv, .csv.gz or binary .maze file, and every subfolder with a data.csv, data.csv.gz or data.maze.
+    :param inputFolder: The folder of inputs.
+    :param outputFolder: The folder each maze gets an output folder in, named after the maze.
+    :return: list of (name, maze file, output folder)
+    """
+    batches = []
+    for name in sorted(os.listdir(inputFolder)):
+        path = join(inputFolder, name)
+        if isdir(path):
+            completeName = run.findMazeFile(path)
+            if isfile(completeName):
+                batches.append((name, completeName, join(outputFolder, name)))
+        else:
+            for extension in (".csv", ".csv.gz", ".maze"):
+                if name.endswith(extension):
+                    stem = name[:-len(extension)]
+                    batches.append((stem, path, join(outputFolder, stem)))
+    return batches
+
+def batchWorker(connection, options):
+    """
+    Solves mazes sent over a pipe until it receives None.
+    :param connection: This worker's end of the pipe.
+    :param options (dict): Keyword arguments for run.solveMazeFile.
+    """
+    while True:
+        task = connection.recv()
+        if task is None:
+            return
+        index, completeName, output_folder = task
+        startTime = perf_counter()
+        search = dict()
+        try:
+            os.makedirs(output_folder, exist_ok=True)
+            result = run.solveMazeFile(completeName, output_folder, **options)
+            status = "solved" if result["solved"] else "unsolved"
+            message = result["message"]
+            search = {"mode": result["mode"], "expanded": result["expanded"], "abstractNodes": result.get("abstractNodes")}
+        except Exception as error: # one broken maze must not take down the batch
+            status = "failed"
+            message = type(error).__name__ + ": " + str(error)
+        connection.send((index, status, message, perf_counter() - startTime, search))
+
+def runBatches(batches, workers=None, timeout=None, options=None):
+    """
+    Solves and renders every maze with a pool of worker processes.
+    A maze that takes longer than timeout seconds has its worker killed and replaced.
+    :param batches (list): (name, maze file, output folder) of every maze.
+    :param workers (int): Number of worker processes. Default is the number of CPUs.
+    :param timeout (float): Seconds each maze may take. Default is None (no limit).
+    :param options (dict): Keyword arguments for run.solveMazeFile. Default is run.optionsFromEnvironment().
+    :return: list of dicts with the name, status ("solved", "unsolved", "failed" or "timeout"), message and seconds of every maze,
+    and the search mode, number of cells expanded and HPA* abstract nodes expanded of every maze that was solved or found unsolvable
+    """
+    if not batches:
+        return []
+    if options is None:
+        options = run.optionsFromEnvironment()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(batches)))
+    for module in ("maze", "solver", "render"): # loaded before the workers start, so forked workers begin warm
+        importlib.import_module(module)
+    results = [None] * len(batches)
+    pending = list(range(len(batches)))
+    pending.reverse()
+    pool = [parallel.startWorker(batchWorker, options) for _ in range(workers)]
+    running = dict() # worker index in pool -> (batch index, start time)
+
+    def assign(slot):
+        if pending:
+            index = pending.pop()
+            name, completeName, output_folder = batches[index]
+            pool[slot][1].send((index, completeName, output_folder))
+            running[slot] = (index, perf_counter())
+
+    for slot in range(workers):
+        assign(slot)
+    while running:
+        waitTime = None
+        if timeout is not None:
+            oldest = min(startTime for index, startTime in running.values())
+            waitTime = max(0, oldest + timeout - perf_counter())
+        ready = wait([pool[slot][1] for slot in running], waitTime)
+        for slot in list(running):
+            worker, connection = pool[slot]
+            index, startTime = running[slot]
+            if connection in ready:
+                try:
+                    index, status, message, seconds, search = connection.recv()
+                except EOFError: # the worker died, e.g. killed for running out of memory
+                    status, message, seconds, search = "failed", "Worker exited with code " + str(worker.exitcode), perf_counter() - startTime, dict()
+                    pool[slot] = parallel.startWorker(batchWorker, options)
+            elif timeout is not None and perf_counter() - startTime >= timeout:
+                worker.kill()
+                worker.join()
+                status, message, seconds, search = "timeout", "Took longer than " + str(timeout) + " seconds.", perf_counter() - startTime, dict()
+                pool[slot] = parallel.startWorker(batchWorker, options)
+            else:
+                continue
+            del running[slot]
+            results[index] = {"name": batches[index][0], "input": batches[index][1], "output": batches[index][2],
+                              "status": status, "message": message.strip(), "seconds": round(seconds, 4), **search}
+            assign(slot)
+    for worker, connection in pool:
+        connection.send(None)
+        worker.join()
+    return results
+
+def writeSummary(results, completeName, wallTime):
+    """
+    Writes the results of a batch run as JSON.
+    :param results (list): The results from runBatches.
+    :param completeName: The file to write.
+    :param wallTime (float): Seconds the whole batch took.
+    :return: summary (dict), see parallel.writeSummary
+    """
+    return parallel.writeSummary(results, completeName, wallTime, mazeSeconds=round(sum(result["seconds"] for result in results), 4))
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many mazes in parallel.")
+    parser.add_argument("source", help="automate.yml to run its batches, or a folder of mazes")
+    parser.add_argument("--output", help="folder for the outputs of a folder of mazes (default: <source>/output)")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--timeout", type=float, help="seconds each maze may take")
+    parser.add_argument("--summary", help="where to write the summary (default: " + SUMMARY_NAME + " next to the source)")
+    args = parser.parse_args()
+    if isdir(args.source):
+        batches = batchesFromFolder(args.source, args.output or join(args.source, "output"))
+        summaryName = args.summary or join(args.source, SUMMARY_NAME)
+    else:
+        batches = batchesFromConfig(args.source)
+        summaryName = args.summary or join(dirname(os.path.abspath(args.source)), SUMMARY_NAME)
+    startTime = perf_counter()
+    results = runBatches(batches, args.workers, args.timeout)
+    parallel.printSummary(writeSummary(results, summaryName, perf_counter() - startTime), summaryName)
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+from multiprocessing import TimeoutError, get_context
+from os.path import dirname, join
+from generate import generateMaze, KINDS
+from convert import writeMazeAs
+
+SOLVERS = ("grid", "jps", "bidirectional", "hpa", "networkx")
+RENDERS = ("none", "image", "tiles") # no drawing, one mazeImage.png, or a tile pyramid
+SIZES = (10, 100, 300) # The default benchmark sizes, each maze is size x size
+NETWORKX_CELLS = 300 * 300 # Largest maze the NetworkX solver is run on, it holds a Python object for every edge
+TILES_CELLS = 1000 * 1000 # Largest maze drawn as a tile pyramid
+TOLERANCE = .25 # How much slower or bigger than the baseline a case may get before it is a regression
+NOISE_SECONDS = .05 # Time differences smaller than this are never regressions
+NOISE_BYTES = 16 * 2**20 # Neither are memory differences smaller than this
+BASELINE_NAME = join(dirname(os.path.abspath(__file__)), "benchmarkBaseline.json")
+RESULTS_NAME = "benchmark.json"
+
+###
+
+def benchmarkCase(completeName, folder, solver="grid", render="none", pruneWalls=True):
+    """
+    Reads, solves and draws one maze the way run.py does, timing every stage. Runs in a fresh process of its own,
+    so the peak memory is that of this case alone.
+    :param completeName: The maze file.
+    :param folder: The output folder for the drawing.
+    :param solver (str): One of SOLVERS.
+    :param render (str): One of RENDERS.
+    :param pruneWalls (bool): Whether walls are impassable.
+    :return: dict of the measurements, see metrics.Metrics.toDict, with "status"
+    """
+    from metrics import stage, record, startMetrics, stopMetrics
+    from maze import readMaze
+    from analysis import analyzeMaze
+    from run import validateMaze, searchMode, findPath, mazeSolution, drawSolution
+    metrics = startMetrics()
+    with stage("parse"):
+        maze = readMaze(completeName)
+    with stage("analyze"):
+        summary = analyzeMaze(maze)
+    with stage("validate"):
+        validation = validateMaze(maze, summary=summary)
+    if not validation[0]:
+        record(status="invalid")
+        return stopMetrics().toDict()
+    mode = searchMode(solver)
+    path, search = findPath(maze, completeName, folder, mode, pruneWalls=pruneWalls)
+    record(expanded=search.expanded if search is not None else None, status="solved" if path is not None else "no path")
+    if path is not None and render != "none":
+        with stage("solution"):
+            pathMask = mazeSolution(maze, path)
+        drawSolution(maze, pathMask, folder, "on" if render == "tiles" else "off", summary)
+    stopMetrics()
+    return metrics.toDict()
+
+def benchmarkCases(sizes, solvers=SOLVERS, renders=RENDERS):
+    """
+    Lists the cases to run for every maze size: every solver without drawing, then the grid solver with each way of drawing.
+    Cases too big for a solver or drawing are left out (see NETWORKX_CELLS, TILES_CELLS and tiles.PIXEL_BUDGET).
+    :return: list of (size, solver, render)
+    """
+    from tiles import PIXEL_BUDGET
+    cases = []
+    for size in sizes:
+        cells = size * size
+        for solver in solvers:
+            if solver != "networkx" or cells <= NETWORKX_CELLS:
+                cases.append((size, solver, "none"))
+        if "image" in renders and cells * 50 * 50 <= PIXEL_BUDGET: # cells are drawn at most 50 pixels wide, see render.determineScale
+            cases.append((size, "grid", "image"))
+        if "tiles" in renders and cells <= TILES_CELLS:
+            cases.append((size, "grid", "tiles"))
+    return cases
+
+def caseKey(result):
+    return "/".join([result["kind"], str(result["size"]), result["solver"], result["render"]])
+
+def runBenchmark(workFolder, sizes=SIZES, kinds=KINDS, solvers=SOLVERS, renders=RENDERS, format=".csv", seed=0, pruneWalls=True, timeout=None):
+    """
+    Generates a maze of every kind and size and runs each benchmark case on it in a fresh process.
+    :param workFolder: Folder the generated mazes and drawings are written to.
+    :param format (str): The maze file format, ".csv", ".csv.gz" or ".maze", so parsing each can be measured.
+    :param timeout (float): Seconds a case may take before it is stopped and reported as "timeout".
+    :return: list of dict, one per case
+    """
+    results = []
+    cases = benchmarkCases(sizes, solvers, renders)
+    context = get_context("spawn") # a fresh interpreter per case, so nothing is shared or counted twice
+    for kind in kinds:
+        for size in sizes:
+            completeName = join(workFolder, kind + "-" + str(size) + format)
+            writeMazeAs(generateMaze(kind, size, size, seed), completeName)
+            for caseSize, solver, render in cases:
+                if caseSize != size:
+                    continue
+                folder = join(workFolder, kind + "-" + str(size) + "-" + solver + "-" + render)
+                os.makedirs(folder, exist_ok=True)
+                pool = context.Pool(1)
+                try:
+                    measured = pool.apply_async(benchmarkCase, (completeName, folder, solver, render, pruneWalls)).get(timeout)
+                except TimeoutError:
+                    measured = {"status": "timeout"}
+                finally:
+                    pool.terminate()
+                result = summarize(kind, size, solver, render, measured)
+                results.append(result)
+                print(formatResult(result), flush=True)
+    return results
+
+def summarize(kind, size, solver, render, measured):
+    """
+    Adds up the time of every stage of a case, and its throughput in cells per second.
+    :return: dict
+    """
+    seconds = dict()
+    for entry in measured.get("stages", []):
+        seconds[entry["name"]] = round(seconds.get(entry["name"], 0) + entry["seconds"], 6)
+    total = measured.get("totalSeconds")
+    return {"kind": kind, "size": size, "solver": solver, "render": render, "status": measured["status"], "seconds": seconds,
+            "totalSeconds": total, "cellsPerSecond": round(size * size / total) if total else None,
+            "peakRssBytes": measured.get("peakRssBytes"), "expanded": measured.get("expanded"), "frontierPeak": measured.get("frontierPeak")}
+
+def formatResult(result):
+    seconds = "  ".join(name + " " + format(value, ".3f") for name, value in result["seconds"].items())
+    memory = str(result["peakRssBytes"] // 2**20) + " MiB" if result["peakRssBytes"] else "-"
+    return (caseKey(result).ljust(36) + result["status"].ljust(9) + str(result["cellsPerSecond"] or "-").rjust(12) + " cells/s  "
+            + memory.rjust(9) + "  expanded " + str(result["expanded"]) + "  " + seconds)
+
+def compareResults(results, baseline, tolerance=TOLERANCE):
+    """
+    Compares benchmark results with a baseline run of the same cases. A case regressed when a stage, its total time or its
+    peak memory grew by more than tolerance (and by more than the noise floor), when its search expanded more cells,
+    or when its status changed. Cases missing from either run are skipped.
+    :param results (list): Results of runBenchmark.
+    :param baseline (list): Results of an earlier runBenchmark.
+    :return: list of str, one per regression
+    """
+    before = {caseKey(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        key = caseKey(result)
+        if key not in before:
+            continue
+        old = before[key]
+        if result["status"] != old["status"]:
+            regressions.append(key + ": status " + old["status"] + " -> " + result["status"])
+            continue
+        times = [(name, old["seconds"].get(name), value) for name, value in result["seconds"].items()]
+        times.append(("total", old["totalSeconds"], result["totalSeconds"]))
+        for name, oldValue, value in times:
+            if oldValue is not None and value is not None and value > oldValue * (1 + tolerance) and value - oldValue > NOISE_SECONDS:
+                regressions.append(key + ": " + name + " " + format(oldValue, ".3f") + "s -> " + format(value, ".3f") + "s")
+        oldMemory, memory = old["peakRssBytes"], result["peakRssBytes"]
+        if oldMemory and memory and memory > oldMemory * (1 + tolerance) and memory - oldMemory > NOISE_BYTES:
+            regressions.append(key + ": peak memory " + str(oldMemory // 2**20) + " MiB -> " + str(memory // 2**20) + " MiB")
+        if old["expanded"] is not None and result["expanded"] is not None and result["expanded"] > old["expanded"]:
+            regressions.append(key + ": expanded " + str(old["expanded"]) + " -> " + str(result["expanded"]))
+    return regressions
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parsing, solving and drawing generated mazes.")
+    parser.add_argument("--work", default="benchmark", help="folder for the generated mazes and drawings (default: benchmark)")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated maze sizes (default: " + ",".join(map(str, SIZES)) + ")")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma separated maze kinds (default: all)")
+    parser.add_argument("--solvers", default=",".join(SOLVERS), help="comma separated solvers (default: all)")
+    parser.add_argument("--renders", default=",".join(RENDERS), help="comma separated ways of drawing (default: all)")
+    parser.add_argument("--format", default=".csv", choices=(".csv", ".csv.gz", ".maze"), help="maze file format (default: .csv)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the maze generator (default: 0)")
+    parser.add_argument("--walls", choices=("impassable", "weighted"), default="impassable", help="whether walls can be passed at their weight (default: impassable)")
+    parser.add_argument("--timeout", type=float, help="seconds each case may take")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE_NAME, help="compare with a baseline (default: benchmarkBaseline.json)")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE_NAME, help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before a regression (default: " + str(TOLERANCE) + ")")
+    args = parser.parse_args()
+    os.makedirs(args.work, exist_ok=True)
+    results = runBenchmark(args.work, [int(size) for size in args.sizes.split(",")], args.kinds.split(","), args.solvers.split(","),
+                           args.renders.split(","), args.format, args.seed, args.walls == "impassable", args.timeout)
+    with open(join(args.work, RESULTS_NAME), "w") as file:
+        json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compareResults(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        print(str(len(regressions)) + " regressions against " + args.baseline + ".")
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from os.path import join
+from uuid import uuid4
+
+# Only the standard library is used here, so a cache hit never imports NumPy, the solver or the renderer
+
+CACHE_VERSION = 3 # Bump when solver or renderer output or the cached result changes, so old entries stop matching
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESULT_NAME = "result.json"
+
+###
+
+def mazeKey(mazeFile, extraFiles=(), **options):
+    """
+    Hashes the contents of a maze file together with the options that change the output.
+    A gzipped maze hashes the same as the plain CSV inside it.
+    :param mazeFile: The CSV, .csv.gz or binary .maze file of the maze.
+    :param extraFiles: Other input files that change the output, such as a goal list.
+    :param options: The solver options and render scale, e.g. solver="grid", pruneWalls=False, scale="auto".
+    :return: str, hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"version": CACHE_VERSION, **options}, sort_keys=True).encode())
+    for completeName in [mazeFile, *extraFiles]:
+        opener = gzip.open if str(completeName).endswith(".gz") else open
+        with opener(completeName, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(b"\0") # keeps the boundary between files part of the key
+    return digest.hexdigest()
+
+def entryFolder(cacheFolder, key):
+    return join(cacheFolder, key[:2], key)
+
+def copyArtifact(source, destination):
+    """
+    Copies an artifact, which is a file or a folder such as the tiles of a pyramid.
+    """
+    if os.path.isdir(source):
+        shutil.rmtree(destination, ignore_errors=True) # leftovers of an earlier run must not mix in
+        shutil.copytree(source, destination)
+    else:
+        shutil.copyfile(source, destination)
+
+def folderSize(path):
+    return sum(item.stat().st_size if not item.is_dir() else folderSize(item.path) for item in os.scandir(path))
+
+def fetchCached(cacheFolder, key, output_folder):
+    """
+    Copies a cached result's artifacts into output_folder.
+    :param cacheFolder: The root folder of the cache.
+    :param key: The key from mazeKey.
+    :param output_folder: Folder the artifacts are copied to.
+    :return: the stored result (dict), or None on a cache miss
+    """
+    folder = entryFolder(cacheFolder, key)
+    try:
+        with open(join(folder, RESULT_NAME)) as file:
+            result = json.load(file)
+        for name in result["artifacts"]:
+            copyArtifact(join(folder, name), join(output_folder, name))
+        os.utime(folder) # mark the entry as recently used for LRU eviction
+    except (OSError, ValueError, KeyError): # missing, evicted while we were copying, or unreadable
+        return None
+    return result
+
+def storeCached(cacheFolder, key, output_folder, result, maxBytes=CACHE_MAX_BYTES):
+    """
+    Stores a result and its artifacts from output_folder, then evicts the least recently used entries past maxBytes.
+    The entry is assembled in a temporary folder and renamed into place, so other processes never see half of it.
+    :param cacheFolder: The root folder of the cache.
+    :param key: The key from mazeKey.
+    :param output_folder: Folder holding the artifacts named in result["artifacts"].
+    :param result (dict): JSON serializable result, with an "artifacts" list of file and folder names.
+    :param maxBytes (int): Size the cache is trimmed back to.
+    """
+    folder = entryFolder(cacheFolder, key)
+    if os.path.isdir(folder):
+        return
+    os.makedirs(os.path.dirname(folder), exist_ok=True)
+    staging = join(cacheFolder, ".tmp-" + uuid4().hex)
+    os.makedirs(staging)
+    try:
+        for name in result["artifacts"]:
+            copyArtifact(join(output_folder, name), join(staging, name))
+        with open(join(staging, RESULT_NAME), "w") as file:
+            json.dump(result, file)
+        os.rename(staging, folder)
+    except OSError: # another process stored the same entry first
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    evictCached(cacheFolder, maxBytes)
+
+def evictCached(cacheFolder, maxBytes=CACHE_MAX_BYTES):
+    """
+    Removes the least recently used entries until the cache is no bigger than maxBytes.
+    Entries are renamed away before they are deleted, so readers see them either whole or not at all.
+    :param cacheFolder: The root folder of the cache.
+    :param maxBytes (int): Size the cache is trimmed back to.
+    """
+    entries = []
+    total = 0
+    for shard in os.scandir(cacheFolder):
+        if not shard.is_dir() or shard.name.startswith("."):
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                size = folderSize(entry.path)
+                entries.append((entry.stat().st_mtime, size, entry.path))
+            except OSError: # removed by another process
+                continue
+            total += size
+    entries.sort()
+    for accessTime, size, path in entries:
+        if total <= maxBytes:
+            break
+        trash = join(cacheFolder, ".old-" + uuid4().hex)
+        try:
+            os.rename(path, trash)
+        except OSError: # another process is already evicting it
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+        total -= size
@@ -0,0 +1,36 @@
+import argparse
+from maze import readMaze, writeMazeBinary, writeMazeCSV, MAZE_EXTENSION
+
+###
+
+def convertMaze(source, destination):
+    """
+    Converts a maze file between CSV (.csv or .csv.gz) and the binary maze format (.maze), in either direction.
+    The format of each file is told by its name.
+    :param source: The maze file to read.
+    :param destination: The maze file to write.
+    :return: Maze, the maze that was converted
+    """
+    maze = readMaze(source)
+    writeMazeAs(maze, destination)
+    return maze
+
+def writeMazeAs(maze, destination):
+    """
+    Writes a Maze in the format its file name asks for: binary for .maze, otherwise CSV (gzipped for .csv.gz).
+    :param maze (Maze): The maze to write.
+    :param destination: The maze file to write.
+    """
+    if str(destination).endswith(MAZE_EXTENSION):
+        writeMazeBinary(maze, destination)
+    else:
+        writeMazeCSV(maze, destination)
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a maze between CSV and the binary maze format.")
+    parser.add_argument("source", help="maze file to read (.csv, .csv.gz or " + MAZE_EXTENSION + ")")
+    parser.add_argument("destination", help="maze file to write (.csv, .csv.gz or " + MAZE_EXTENSION + ")")
+    args = parser.parse_args()
+    maze = convertMaze(args.source, args.destination)
+    print("Converted a " + str(maze.rows) + " x " + str(maze.cols) + " maze to " + args.destination + ".")
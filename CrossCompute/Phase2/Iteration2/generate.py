@@ -0,0 +1,132 @@
+import argparse
+import numpy as np
+from maze import Maze, EMPTY, WALL, START, END, WEIGHTED, WALL_WEIGHT
+from convert import writeMazeAs
+
+ROOM_SIZE = 12 # Width and height of a room in open room mazes, including its wall
+TERRAIN_BLOCK = 16 # Width and height of the patches of similar weights in weighted terrain
+KINDS = ("perfect", "rooms", "terrain", "unsolvable")
+
+###
+
+def perfectMaze(rows, cols, seed=0):
+    """
+    A perfect maze (exactly one path between any two cells) carved with the sidewinder algorithm, one row at a time
+    with array operations so even 10000 x 10000 mazes take seconds. Corridors are one cell wide, cells sit at odd rows and cols.
+    The start point is at the bottom left and the end point at the bottom right, so the path winds up and down between them.
+    :param rows (int): Number of rows, at least 5.
+    :param cols (int): Number of cols, at least 5.
+    :param seed (int): Seed of the random generator.
+    :return: Maze
+    """
+    rng = np.random.default_rng(seed)
+    cellRows, cellCols = (rows - 1) // 2, (cols - 1) // 2
+    kinds = np.full((rows, cols), WALL, dtype=np.uint8)
+    kinds[1:2*cellRows:2, 1:2*cellCols:2] = EMPTY
+    kinds[1, 1:2*cellCols] = EMPTY # the top row is one open corridor
+    if cellRows > 1:
+        closeRun = rng.random((cellRows - 1, cellCols)) < .5 # whether a run of cells ends here and carves up
+        closeRun[:, -1] = True
+        kinds[3:2*cellRows:2, 2:2*cellCols-1:2][~closeRun[:, :-1]] = EMPTY # join the cells of each run
+        runEnds = np.flatnonzero(closeRun.ravel()) # runs never cross rows, since the last cell of a row always ends one
+        runStarts = np.concatenate(([0], runEnds[:-1] + 1))
+        chosen = runStarts + (rng.random(len(runEnds)) * (runEnds - runStarts + 1)).astype(np.int64) # a random cell of every run
+        row, col = np.divmod(chosen, cellCols)
+        kinds[2*row + 2, 2*col + 1] = EMPTY # carve up into the row above
+    return withPoints(kinds, (2*cellRows - 1, 1), (2*cellRows - 1, 2*cellCols - 1))
+
+def roomsMaze(rows, cols, seed=0):
+    """
+    Open rooms of ROOM_SIZE cells divided by walls, with one door in the wall between every pair of neighboring rooms.
+    The start point is in the top left room and the end point in the bottom right room.
+    :param rows (int): Number of rows, at least 5.
+    :param cols (int): Number of cols, at least 5.
+    :param seed (int): Seed of the random generator.
+    :return: Maze
+    """
+    rng = np.random.default_rng(seed)
+    kinds = np.full((rows, cols), EMPTY, dtype=np.uint8)
+    wallRows = list(range(ROOM_SIZE, rows - 1, ROOM_SIZE)) # the last row and col are never walls, so every room has cells
+    wallCols = list(range(ROOM_SIZE, cols - 1, ROOM_SIZE))
+    kinds[wallRows, :] = WALL
+    kinds[:, wallCols] = WALL
+    for wallRow in wallRows: # a door into every room from the room above
+        kinds[wallRow, pickDoors(rng, wallCols, cols)] = EMPTY
+    for wallCol in wallCols: # and from the room to the left
+        kinds[pickDoors(rng, wallRows, rows), wallCol] = EMPTY
+    return withPoints(kinds, (0, 0), (rows - 1, cols - 1))
+
+def pickDoors(rng, walls, size):
+    """
+    One random position between every pair of neighboring walls (and the edges), for the doors along a wall across them.
+    """
+    starts = np.array([0] + [wall + 1 for wall in walls])
+    ends = np.array(walls + [size])
+    return starts + (rng.random(len(starts)) * (ends - starts)).astype(np.int64)
+
+def terrainMaze(rows, cols, seed=0):
+    """
+    Random weighted terrain: patches of TERRAIN_BLOCK cells with weights from 1 to 9, a little noise on every cell,
+    and one cell in ten a wall. The start point is at the top left and the end point at the bottom right.
+    :param rows (int): Number of rows, at least 5.
+    :param cols (int): Number of cols, at least 5.
+    :param seed (int): Seed of the random generator.
+    :return: Maze
+    """
+    rng = np.random.default_rng(seed)
+    patches = rng.integers(1, 9, (-(-rows // TERRAIN_BLOCK), -(-cols // TERRAIN_BLOCK)), dtype=np.int32)
+    weights = np.repeat(np.repeat(patches, TERRAIN_BLOCK, axis=0), TERRAIN_BLOCK, axis=1)[:rows, :cols]
+    weights = np.clip(weights + rng.integers(-1, 2, (rows, cols), dtype=np.int32), 1, 9)
+    kinds = np.where(weights > 1, WEIGHTED, EMPTY).astype(np.uint8)
+    kinds[rng.random((rows, cols)) < .1] = WALL
+    return withPoints(kinds, (0, 0), (rows - 1, cols - 1), weights)
+
+def unsolvableMaze(rows, cols, seed=0):
+    """
+    Open rooms whose end point is walled in, so there is no path unless the search may pass through walls.
+    :param rows (int): Number of rows, at least 5.
+    :param cols (int): Number of cols, at least 5.
+    :param seed (int): Seed of the random generator.
+    :return: Maze
+    """
+    kinds = roomsMaze(rows, cols, seed).kinds
+    kinds[rows-2:, cols-2:] = WALL
+    kinds[rows-1, cols-1] = END
+    return withPoints(kinds, (0, 0), (rows - 1, cols - 1))
+
+def withPoints(kinds, startPoint, endPoint, weights=None):
+    """
+    Places the start and end point and fills in the weights of a generated grid of cell kinds.
+    :return: Maze
+    """
+    kinds[startPoint] = START
+    kinds[endPoint] = END
+    if weights is None:
+        weights = np.ones(kinds.shape, dtype=np.int32)
+    weights[kinds == WALL] = WALL_WEIGHT
+    weights[(kinds == START) | (kinds == END) | (kinds == EMPTY)] = 1
+    return Maze(kinds, weights, starts=[startPoint], ends=[endPoint])
+
+def generateMaze(kind, rows, cols, seed=0):
+    """
+    Generates a maze of one of the KINDS. The same kind, size and seed always give the same maze.
+    :param kind (str): "perfect", "rooms", "terrain" or "unsolvable".
+    :return: Maze
+    """
+    generators = {"perfect": perfectMaze, "rooms": roomsMaze, "terrain": terrainMaze, "unsolvable": unsolvableMaze}
+    if kind not in generators:
+        raise ValueError("Unknown maze kind " + kind + ", expected one of " + ", ".join(KINDS) + ".")
+    if rows < 5 or cols < 5:
+        raise ValueError("A generated maze needs at least 5 rows and 5 cols.")
+    return generators[kind](rows, cols, seed)
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible maze.")
+    parser.add_argument("kind", choices=KINDS, help="perfect maze, open rooms, weighted terrain, or rooms with the end point walled in")
+    parser.add_argument("rows", type=int, help="number of rows")
+    parser.add_argument("cols", type=int, help="number of cols")
+    parser.add_argument("destination", help="maze file to write (.csv, .csv.gz or .maze)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator (default: 0)")
+    args = parser.parse_args()
+    writeMazeAs(generateMaze(args.kind, args.rows, args.cols, args.seed), args.destination)
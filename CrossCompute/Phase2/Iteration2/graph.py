@@ -0,0 +1,124 @@
+import hashlib
+import os
+import zipfile
+from uuid import uuid4
+import numpy as np
+
+GRAPH_VERSION = 1 # Bump when the snapshot layout changes, so old snapshots are rebuilt
+SNAPSHOT_NAME = "mazeGraph.npz" # The graph snapshot written to the output folder
+EDGELIST_NAME = "weighted.edgelist" # The text dump of the graph written to the output folder
+
+###
+
+class GraphSnapshot:
+    """
+    The graph of a maze in compressed sparse row (CSR) form, the same graph listToNetworkXGraph builds:
+    the edges leaving cell i (numbered row-major) are targets[offsets[i]:offsets[i+1]], each costing the matching weights entry.
+    Edges are listed in the order listToNetworkXGraph adds them (up, left, down, right), so NetworkX searches break ties the same way.
+    :param shape: (rows, cols) of the maze.
+    :param offsets: int64 array of rows*cols + 1 edge offsets.
+    :param targets: int32 (int64 past 2**31 cells) array of the cell every edge goes to.
+    :param weights: int32 array of the cost of every edge.
+    :param pruneWalls (bool): Whether edges into walls were left out.
+    :param digest (str): mazeDigest of the maze the graph was built from.
+    """
+    def __init__(self, shape, offsets, targets, weights, pruneWalls, digest):
+        self.shape = tuple(shape)
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.pruneWalls = pruneWalls
+        self.digest = digest
+
+    @classmethod
+    def fromMaze(cls, maze, pruneWalls=False):
+        """
+        Builds the graph of a maze with array operations instead of one edge at a time.
+        """
+        rows, cols = maze.shape
+        indexType = np.int32 if rows * cols < 2**31 else np.int64
+        cells = np.arange(rows * cols, dtype=indexType).reshape(rows, cols)
+        targets = np.zeros((rows, cols, 4), dtype=indexType)
+        valid = np.zeros((rows, cols, 4), dtype=bool)
+        targets[1:, :, 0] = cells[:-1, :] # up
+        valid[1:, :, 0] = True
+        targets[:, 1:, 1] = cells[:, :-1] # left
+        valid[:, 1:, 1] = True
+        targets[:-1, :, 2] = cells[1:, :] # down
+        valid[:-1, :, 2] = True
+        targets[:, :-1, 3] = cells[:, 1:] # right
+        valid[:, :-1, 3] = True
+        if pruneWalls: # walls get no incoming edges when they are impassable
+            valid &= ~maze.walls.ravel()[targets]
+        counts = valid.sum(axis=2).ravel()
+        offsets = np.zeros(rows * cols + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        targets = targets[valid]
+        return cls((rows, cols), offsets, targets, maze.weights.ravel()[targets].astype(np.int32), pruneWalls, mazeDigest(maze))
+
+    def toNetworkX(self):
+        """
+        Builds the NetworkX graph, adding the nodes and edges in the same order as listToNetworkXGraph.
+        :return: nx.MultiDiGraph
+        """
+        import networkx as nx
+        rows, cols = self.shape
+        nodes = [divmod(index, cols) for index in range(rows * cols)]
+        sources = np.repeat(np.arange(rows * cols), np.diff(self.offsets)).tolist()
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(nodes)
+        G.add_weighted_edges_from(zip([nodes[source] for source in sources], [nodes[target] for target in self.targets.tolist()], self.weights.tolist()),
+                                  weight="weight")
+        return G
+
+    def save(self, completeName):
+        """
+        Writes the snapshot to an uncompressed .npz file, through a temporary file so readers never see half of it.
+        :param completeName: The file to write.
+        """
+        staging = completeName + ".tmp-" + uuid4().hex + ".npz"
+        np.savez(staging, header=np.array([GRAPH_VERSION, self.shape[0], self.shape[1], int(self.pruneWalls)], dtype=np.int64),
+                 digest=np.frombuffer(bytes.fromhex(self.digest), dtype=np.uint8),
+                 offsets=self.offsets, targets=self.targets, weights=self.weights)
+        os.replace(staging, completeName)
+
+def mazeDigest(maze):
+    """
+    Hashes the cells of a maze, so a snapshot is only reused for the maze it was built from.
+    :return: str, hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(maze.kinds, dtype=np.uint8).tobytes())
+    digest.update(np.ascontiguousarray(maze.weights, dtype=np.int32).tobytes())
+    return digest.hexdigest()
+
+def readSnapshot(completeName, maze, pruneWalls=False):
+    """
+    Loads a saved graph snapshot for a maze.
+    :return: GraphSnapshot, or None if the file is missing, unreadable, or was built for another maze, wall setting or version
+    """
+    try:
+        with np.load(completeName) as data:
+            if data["header"].tolist() != [GRAPH_VERSION, maze.rows, maze.cols, int(pruneWalls)]:
+                return None
+            digest = bytes(data["digest"]).hex()
+            if digest != mazeDigest(maze):
+                return None
+            return GraphSnapshot(maze.shape, data["offsets"], data["targets"], data["weights"], pruneWalls, digest)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+def loadSnapshot(folder, maze, pruneWalls=False):
+    """
+    Loads the graph snapshot in a folder if it was built from this maze, or builds the graph and saves a new snapshot.
+    :param folder: The folder holding mazeGraph.npz.
+    :param maze (Maze): The maze the graph is of.
+    :param pruneWalls (bool): Whether edges into walls are left out.
+    :return: GraphSnapshot
+    """
+    name = os.path.join(folder, SNAPSHOT_NAME)
+    snapshot = readSnapshot(name, maze, pruneWalls)
+    if snapshot is None:
+        snapshot = GraphSnapshot.fromMaze(maze, pruneWalls)
+        snapshot.save(name)
+    return snapshot
@@ -0,0 +1,507 @@
+import hashlib
+import os
+import zipfile
+from heapq import heappush, heappop
+from math import ceil
+from multiprocessing import Pool, current_process
+from uuid import uuid4
+import numpy as np
+from solver import SearchResult, flatNeighbors, tracePath, gridAStar
+
+CLUSTER_SIZE = 32 # Width and height of a cluster in cells
+INDEX_VERSION = 1 # Bump when the index layout or the way entrances are picked changes, so old index files are rebuilt
+LONG_ENTRANCE = 6 # Entrances at least this long get a transition at both ends instead of one in the middle
+PARALLEL_CLUSTERS = 256 # Builds touching fewer clusters than this are not worth starting worker processes for
+
+workerIndex = None # The index a build worker process computes cluster costs for
+
+###
+
+class ClusterIndex:
+    """
+    Hierarchical pathfinding (HPA*) over a maze divided into square clusters.
+    Every open stretch of the border between two clusters is an entrance, with one or two transition cells on each side.
+    Transition cells are the nodes of an abstract graph: neighboring transitions across a border are joined by a single move,
+    and transitions in the same cluster are joined by the cost of the cheapest path between them inside the cluster.
+    A query searches the abstract graph and then refines the route with a search through only the clusters along it.
+    Paths are near optimal rather than optimal, because the route through the abstract graph picks which clusters they pass.
+    Walls are never crossed by the abstract graph. When walls are weighted and no path avoids them, the query falls back to gridAStar.
+    :param maze (Maze): The maze to index.
+    :param clusterSize (int): Width and height of a cluster in cells. Default is CLUSTER_SIZE.
+    """
+    def __init__(self, maze, clusterSize=CLUSTER_SIZE):
+        self.maze = maze
+        self.clusterSize = clusterSize
+        self.clusterRows = ceil(maze.rows / clusterSize)
+        self.clusterCols = ceil(maze.cols / clusterSize)
+        self.digests = [b""] * (self.clusterRows * self.clusterCols)
+        self.entrances = dict() # (cluster, neighboring cluster to the right or below) -> list of (cell, cell across the border)
+        self.edges = dict() # cluster -> list of (from cell, to cell, cost) between its transitions
+        self.graph = None
+        self.minWeight = None # the smallest cell weight, found on the first query
+
+    def clusterOf(self, index):
+        row, col = divmod(index, self.maze.cols)
+        return (row // self.clusterSize) * self.clusterCols + col // self.clusterSize
+
+    def bounds(self, cluster):
+        """
+        :return: first row, row after the last, first col, col after the last of a cluster
+        """
+        clusterRow, clusterCol = divmod(cluster, self.clusterCols)
+        size = self.clusterSize
+        return (clusterRow*size, min((clusterRow+1)*size, self.maze.rows),
+                clusterCol*size, min((clusterCol+1)*size, self.maze.cols))
+
+    def neighborClusters(self, cluster):
+        return flatNeighbors(cluster, self.clusterRows, self.clusterCols)
+
+    def clusterDigests(self):
+        """
+        Hashes the weights and walls of every cluster, so an index can tell which clusters changed since it was built.
+        :return: list of bytes
+        """
+        maze = self.maze
+        digests = []
+        for cluster in range(self.clusterRows * self.clusterCols):
+            top, bottom, left, right = self.bounds(cluster)
+            digest = hashlib.blake2b(digest_size=8)
+            digest.update(maze.weights[top:bottom, left:right].tobytes())
+            digest.update(maze.walls[top:bottom, left:right].tobytes())
+            digests.append(digest.digest())
+        return digests
+
+    def findEntrances(self, cluster, other):
+        """
+        Picks the transitions on the border between a cluster and its neighbor to the right or below.
+        :return: list of (cell in cluster, cell in other)
+        """
+        maze = self.maze
+        top, bottom, left, right = self.bounds(cluster)
+        if other != cluster + self.clusterCols: # the neighbor is to the right, so the border is a column
+            inside = np.arange(top, bottom) * maze.cols + right - 1
+            across = inside + 1
+        else:
+            inside = (bottom - 1) * maze.cols + np.arange(left, right)
+            across = inside + maze.cols
+        walls = maze.walls.ravel()
+        opened = ~walls[inside] & ~walls[across]
+        transitions = []
+        start = None
+        for position, isOpen in enumerate(opened.tolist() + [False]):
+            if isOpen and start is None:
+                start = position
+            elif not isOpen and start is not None:
+                if position - start >= LONG_ENTRANCE:
+                    picks = (start, position - 1)
+                else:
+                    picks = ((start + position - 1) // 2,)
+                transitions.extend((int(inside[pick]), int(across[pick])) for pick in picks)
+                start = None
+        return transitions
+
+    def nodesOf(self, cluster):
+        """
+        :return: sorted list of the transition cells in a cluster
+        """
+        nodes = set()
+        for other in self.neighborClusters(cluster):
+            pair = (cluster, other) if cluster < other else (other, cluster)
+            for inside, across in self.entrances.get(pair, []):
+                nodes.add(inside if cluster < other else across)
+        return sorted(nodes)
+
+    def clusterCells(self, cluster):
+        """
+        Lists the cells of a cluster by their index inside the cluster, for searching it.
+        :return: weights (list), open neighbors of every cell (list of lists)
+        """
+        maze = self.maze
+        top, bottom, left, right = self.bounds(cluster)
+        height, width = bottom - top, right - left
+        weights = maze.weights[top:bottom, left:right].ravel().tolist()
+        blocked = maze.walls[top:bottom, left:right].ravel().tolist()
+        neighbors = [[nextIndex for nextIndex in flatNeighbors(index, height, width) if not blocked[nextIndex]]
+                     for index in range(height*width)]
+        return weights, neighbors
+
+    def clusterSearch(self, cluster, source, targets, reverse=False, cells=None):
+        """
+        Dijkstra from one cell to others without leaving a cluster or entering a wall.
+        :param cluster (int): The cluster to search in.
+        :param source (int): Flat index of the cell to start from.
+        :param targets: Flat indices of the cells to find.
+        :param reverse (bool): Find the cost of reaching the source from each target instead, which pays the weight of the
+        cell left rather than the cell entered. Default is False.
+        :param cells: The cluster's clusterCells, when searching it more than once.
+        :return: dict of target -> cost for every target reached, function that traces the path to a target
+        """
+        maze = self.maze
+        top, bottom, left, right = self.bounds(cluster)
+        height, width = bottom - top, right - left
+        weights, neighbors = cells or self.clusterCells(cluster)
+
+        def local(index):
+            row, col = divmod(index, maze.cols)
+            return (row-top)*width + col-left
+
+        remaining = {local(target) for target in targets}
+        start = local(source)
+        costs = [None] * (height*width)
+        parents = [-1] * (height*width)
+        closed = bytearray(height*width)
+        costs[start] = 0
+        frontier = [(0, start)]
+        found = dict()
+        while frontier and remaining:
+            cost, index = heappop(frontier)
+            if closed[index]:
+                continue
+            closed[index] = 1
+            if index in remaining:
+                remaining.discard(index)
+                found[(top + index // width) * maze.cols + left + index % width] = cost
+            for nextIndex in neighbors[index]:
+                if closed[nextIndex]:
+                    continue
+                nextCost = cost + (weights[index] if reverse else weights[nextIndex])
+                if costs[nextIndex] is None or nextCost < costs[nextIndex]:
+                    costs[nextIndex] = nextCost
+                    parents[nextIndex] = index
+                    heappush(frontier, (nextCost, nextIndex))
+
+        def trace(target):
+            path = []
+            index = local(target)
+            while index != -1:
+                path.append((top + index // width, left + index % width))
+                index = parents[index]
+            path.reverse()
+            return path
+        return found, trace
+
+    def clusterEdges(self, cluster):
+        """
+        Finds the cost between every pair of transitions in a cluster. The cheapest path from a to b is the cheapest from b to a,
+        so one search from each transition covers both directions: they only differ by the weights of the two ends.
+        :return: list of (from cell, to cell, cost)
+        """
+        nodes = self.nodesOf(cluster)
+        weights = self.maze.weights.ravel()
+        edges = []
+        cells = self.clusterCells(cluster)
+        for position, node in enumerate(nodes[:-1]):
+            found, trace = self.clusterSearch(cluster, node, nodes[position+1:], cells=cells)
+            for other, cost in found.items():
+                edges.append((node, other, cost))
+                edges.append((other, node, cost + int(weights[node]) - int(weights[other])))
+        return edges
+
+    def build(self, clusters=None, digests=None, workers=None):
+        """
+        Builds the index, or rebuilds the parts of it that depend on the given clusters: the entrances on their borders,
+        and the costs inside them and inside their neighbors, whose transitions may have moved.
+        :param clusters: Clusters whose cells changed. Default is None (every cluster).
+        :param digests (list): The current clusterDigests, if they are already known.
+        :param workers (int): Number of worker processes for the costs inside clusters. Default is the number of CPUs,
+        or 1 inside a daemon process (such as a batch worker), which is not allowed to start processes of its own.
+        """
+        if clusters is None:
+            clusters = range(self.clusterRows * self.clusterCols)
+        changed = set(clusters)
+        touched = set(changed)
+        for cluster in changed:
+            for other in self.neighborClusters(cluster):
+                touched.add(other)
+                pair = (cluster, other) if cluster < other else (other, cluster)
+                self.entrances[pair] = self.findEntrances(*pair)
+        workers = 1 if current_process().daemon else workers or os.cpu_count() or 1
+        if workers > 1 and len(touched) >= PARALLEL_CLUSTERS:
+            with Pool(workers, initializer=startIndexWorker, initargs=(self,)) as pool:
+                for cluster, edges in pool.imap_unordered(indexWorkerEdges, sorted(touched), chunksize=64):
+                    self.edges[cluster] = edges
+        else:
+            for cluster in touched:
+                self.edges[cluster] = self.clusterEdges(cluster)
+        if digests is None:
+            digests = self.clusterDigests()
+        for cluster in changed:
+            self.digests[cluster] = digests[cluster]
+        self.graph = None
+        self.minWeight = None
+
+    def refresh(self):
+        """
+        Rebuilds whatever depends on clusters that changed since the index was built.
+        :return: list of the clusters that changed
+        """
+        digests = self.clusterDigests()
+        changed = [cluster for cluster, digest in enumerate(digests) if digest != self.digests[cluster]]
+        if changed:
+            self.build(changed, digests)
+        return changed
+
+    def abstractGraph(self):
+        """
+        :return: AbstractGraph over every transition
+        """
+        if self.graph is None:
+            weights = self.maze.weights.ravel()
+            transitions = np.array([pair for pairs in self.entrances.values() for pair in pairs], dtype=np.int64).reshape(-1, 2)
+            edges = np.array([edge for clusterEdges in self.edges.values() for edge in clusterEdges], dtype=np.int64).reshape(-1, 3)
+            sources = np.concatenate((transitions.ravel(), edges[:, 0])) # a single move each way across every border
+            targets = np.concatenate((transitions[:, ::-1].ravel(), edges[:, 1]))
+            costs = np.concatenate((weights[transitions[:, ::-1].ravel()].astype(np.int64), edges[:, 2]))
+            order = np.argsort(sources, kind="stable")
+            nodes, counts = np.unique(sources, return_counts=True)
+            self.graph = AbstractGraph(nodes, np.concatenate(([0], np.cumsum(counts))), targets[order], costs[order])
+        return self.graph
+
+    def entranceRows(self):
+        """
+        :return: list of (cluster, neighboring cluster, cell in cluster, cell across the border) of every transition
+        """
+        return [(pair[0], pair[1], inside, across) for pair, transitions in self.entrances.items() for inside, across in transitions]
+
+    def sharedArrays(self):
+        """
+        The arrays a query needs, for sharing the index with other processes, see sharedIndex.
+        :return: dict of name -> array
+        """
+        graph = self.abstractGraph()
+        arrays = {"entrances": np.array(self.entranceRows(), dtype=np.int64).reshape(-1, 4)}
+        arrays.update((name, getattr(graph, name)) for name in AbstractGraph.NAMES)
+        return arrays
+
+    def query(self, startPoint, endPoint, pruneWalls=False, grids=None):
+        """
+        Finds a path by searching the abstract graph, then refining the route with a search through the clusters along it.
+        :param startPoint: (row, col) of the start point.
+        :param endPoint: (row, col) of the end point.
+        :param pruneWalls (bool): Whether walls are left out of the search. When False, a maze that can only be solved through
+        a wall is handed to gridAStar. Default is False.
+        :param grids (SearchGrids): The maze's grids prepared for many searches, for gridAStar. Default is to copy them for each search.
+        :return: SearchResult, where abstractNodes counts the abstract nodes expanded, frontier the most abstract nodes on the
+        frontier and expanded the cells expanded refining the route. A search handed to gridAStar has no abstractNodes.
+        """
+        maze = self.maze
+        cols = maze.cols
+        startIndex = startPoint[0]*cols + startPoint[1]
+        endIndex = endPoint[0]*cols + endPoint[1]
+        walls = maze.walls.ravel()
+        if walls[startIndex] or walls[endIndex]:
+            return gridAStar(maze, startPoint, endPoint, pruneWalls, grids)
+        graph = self.abstractGraph()
+        startCluster, endCluster = self.clusterOf(startIndex), self.clusterOf(endIndex)
+        endNodes = self.nodesOf(endCluster)
+        leaving, _ = self.clusterSearch(startCluster, startIndex, self.nodesOf(startCluster) + ([endIndex] if endCluster == startCluster else []))
+        arriving, _ = self.clusterSearch(endCluster, endIndex, endNodes, reverse=True) # cost of reaching the end point from each transition
+        if self.minWeight is None:
+            self.minWeight = max(int(maze.weights.min()), 0)
+        minWeight = self.minWeight
+        endRow, endCol = endPoint
+
+        def estimate(index):
+            row, col = divmod(index, cols)
+            return minWeight * (abs(row-endRow) + abs(col-endCol))
+
+        costs = {startIndex: 0}
+        parents = {startIndex: None}
+        closed = set()
+        frontier = [(estimate(startIndex), startIndex)]
+        expanded = 0
+        peak = 1
+        while frontier:
+            _, index = heappop(frontier)
+            if index in closed:
+                continue
+            closed.add(index)
+            expanded += 1
+            if index == endIndex:
+                break
+            moves = graph.get(index, [])
+            if index == startIndex:
+                moves = moves + list(leaving.items())
+            if index in arriving:
+                moves = moves + [(endIndex, arriving[index])]
+            for nextIndex, step in moves:
+                nextCost = costs[index] + step
+                if nextIndex not in costs or nextCost < costs[nextIndex]:
+                    costs[nextIndex] = nextCost
+                    parents[nextIndex] = index
+                    heappush(frontier, (nextCost + estimate(nextIndex), nextIndex))
+            if len(frontier) > peak:
+                peak = len(frontier)
+        if endIndex not in closed:
+            if pruneWalls:
+                return SearchResult(None, None, 0, peak, expanded) # every open border has a transition, so the abstract graph connects whatever the maze does
+            return gridAStar(maze, startPoint, endPoint, pruneWalls, grids)
+        route = [endIndex]
+        while parents[route[-1]] is not None:
+            route.append(parents[route[-1]])
+        path, cost, cells = self.corridorSearch({self.clusterOf(index) for index in route}, startIndex, endIndex)
+        return SearchResult(path, cost, cells, peak, expanded)
+
+    def corridorSearch(self, clusters, startIndex, endIndex):
+        """
+        Refines a route with A* through the clusters along it, without entering a wall. The path is free to cross a border
+        anywhere rather than only at a transition, so it is the cheapest one inside the corridor and never costs more than the
+        route through the abstract graph, which lies inside it. Only the cells reached are kept, not a grid of the whole maze.
+        :param clusters (set): The clusters the route passes through.
+        :param startIndex (int): Flat index of the start point.
+        :param endIndex (int): Flat index of the end point, which the route has to reach.
+        :return: path (list of (row, col)), cost (int), number of cells expanded (int)
+        """
+        maze = self.maze
+        rows, cols = maze.shape
+        size, clusterCols = self.clusterSize, self.clusterCols
+        weights = memoryview(maze.weights.reshape(-1)) # read in place, so a maze in shared memory is not copied
+        walls = memoryview(maze.walls.reshape(-1))
+        minWeight = self.minWeight
+        endRow, endCol = divmod(endIndex, cols)
+        costs = {startIndex: 0}
+        parents = {startIndex: -1}
+        closed = set()
+        frontier = [(0, 0, startIndex)]
+        while frontier:
+            _, _, index = heappop(frontier)
+            if index in closed:
+                continue
+            closed.add(index)
+            if index == endIndex:
+                break
+            cost = costs[index]
+            for nextIndex in flatNeighbors(index, rows, cols):
+                if nextIndex in closed or walls[nextIndex]:
+                    continue
+                nextRow, nextCol = divmod(nextIndex, cols)
+                if (nextRow // size) * clusterCols + nextCol // size not in clusters:
+                    continue
+                nextCost = cost + weights[nextIndex]
+                if nextIndex not in costs or nextCost < costs[nextIndex]:
+                    costs[nextIndex] = nextCost
+                    parents[nextIndex] = index
+                    heappush(frontier, (nextCost + minWeight * (abs(nextRow-endRow) + abs(nextCol-endCol)), -nextCost, nextIndex))
+        return tracePath(parents, endIndex, cols), costs[endIndex], len(closed)
+
+    def save(self, completeName):
+        """
+        Writes the index to a .npz file, through a temporary file so readers never see half of it.
+        :param completeName: The file to write.
+        """
+        entrances = self.entranceRows()
+        edges = [(cluster, node, other, cost) for cluster, clusterEdges in self.edges.items() for node, other, cost in clusterEdges]
+        staging = completeName + ".tmp-" + uuid4().hex + ".npz"
+        np.savez_compressed(staging,
+                            header=np.array([INDEX_VERSION, self.maze.rows, self.maze.cols, self.clusterSize], dtype=np.int64),
+                            digests=np.frombuffer(b"".join(self.digests), dtype=np.uint8).reshape(-1, 8),
+                            entrances=np.array(entrances or np.zeros((0, 4)), dtype=np.int64),
+                            edges=np.array(edges or np.zeros((0, 4)), dtype=np.int64))
+        os.replace(staging, completeName)
+
+class AbstractGraph:
+    """
+    The abstract graph of a ClusterIndex in compressed sparse row form, like the graph snapshots of run.py: the moves from
+    nodes[i] go to targets[offsets[i]:offsets[i+1]] at the costs in the same places. Flat arrays take far less memory than
+    lists of moves, and can be shared between processes.
+    :param nodes: Sorted flat indices of the transition cells.
+    :param offsets: Where the moves of each node start in targets and costs, with the end of the last one after them.
+    :param targets: Flat index of the cell each move goes to.
+    :param costs: The cost of each move.
+    """
+    NAMES = ("nodes", "offsets", "targets", "costs")
+
+    def __init__(self, nodes, offsets, targets, costs):
+        self.nodes = nodes
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+
+    def get(self, node, default=None):
+        """
+        :return: list of (next cell, cost) of every move from a cell, or default if the cell is not a node
+        """
+        position = int(np.searchsorted(self.nodes, node))
+        if position == len(self.nodes) or self.nodes[position] != node:
+            return default
+        start, end = int(self.offsets[position]), int(self.offsets[position+1])
+        return list(zip(self.targets[start:end].tolist(), self.costs[start:end].tolist()))
+
+def startIndexWorker(index):
+    global workerIndex
+    workerIndex = index
+
+def indexWorkerEdges(cluster):
+    return cluster, workerIndex.clusterEdges(cluster)
+
+def indexFile(completeName):
+    """
+    The index file that sits next to a maze file, e.g. data.hpa.npz for data.csv, data.csv.gz or data.maze.
+    """
+    stem = str(completeName)
+    for extension in (".gz", ".csv", ".maze"):
+        if stem.endswith(extension):
+            stem = stem[:-len(extension)]
+    return stem + ".hpa.npz"
+
+def readIndex(completeName, maze, clusterSize=CLUSTER_SIZE):
+    """
+    Loads a saved index for a maze.
+    :return: ClusterIndex, or None if the file is missing, unreadable, or was built for another maze size, cluster size or version
+    """
+    try:
+        with np.load(completeName) as data:
+            header = data["header"].tolist()
+            if header != [INDEX_VERSION, maze.rows, maze.cols, clusterSize]:
+                return None
+            index = ClusterIndex(maze, clusterSize)
+            digests = data["digests"]
+            if len(digests) != len(index.digests):
+                return None
+            index.digests = [bytes(digest) for digest in digests]
+            for cluster, other, inside, across in data["entrances"].tolist():
+                index.entrances.setdefault((cluster, other), []).append((inside, across))
+            for cluster in range(len(index.digests)):
+                index.edges[cluster] = []
+            for cluster, node, other, cost in data["edges"].tolist():
+                index.edges[cluster].append((node, other, cost))
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    return index
+
+def sharedIndex(maze, arrays, clusterSize=CLUSTER_SIZE):
+    """
+    An index on the arrays of ClusterIndex.sharedArrays, which are used in place (such as in shared memory) rather than copied.
+    It answers queries, but has no cluster edges to refresh or save.
+    :param maze (Maze): The maze the index was built for.
+    :param arrays (dict): The arrays from ClusterIndex.sharedArrays.
+    :param clusterSize (int): Width and height of a cluster in cells. Default is CLUSTER_SIZE.
+    :return: ClusterIndex
+    """
+    index = ClusterIndex(maze, clusterSize)
+    for cluster, other, inside, across in arrays["entrances"].tolist():
+        index.entrances.setdefault((cluster, other), []).append((inside, across))
+    index.graph = AbstractGraph(*(arrays[name] for name in AbstractGraph.NAMES))
+    return index
+
+def loadIndex(completeName, maze, clusterSize=CLUSTER_SIZE):
+    """
+    Loads the index saved next to a maze file, rebuilding the clusters whose cells changed since it was saved,
+    or builds a new one. The index is saved again whenever anything was rebuilt.
+    :param completeName: The maze file.
+    :param maze (Maze): The maze read from it.
+    :param clusterSize (int): Width and height of a cluster in cells. Default is CLUSTER_SIZE.
+    :return: ClusterIndex
+    """
+    name = indexFile(completeName)
+    index = readIndex(name, maze, clusterSize)
+    if index is None:
+        index = ClusterIndex(maze, clusterSize)
+        index.build()
+    elif not index.refresh():
+        return index
+    try:
+        index.save(name)
+    except OSError: # a read-only input folder only means the index is built again next time
+        pass
+    return index
@@ -0,0 +1,205 @@
+import csv
+from heapq import heappush, heappop
+import numpy as np
+from maze import classifyCell, openText, WALL, START, END
+from solver import SearchResult, noPath, flatNeighbors
+
+INF = float("inf")
+
+###
+
+class IncrementalSolver:
+    """
+    A solver session that keeps its search state between edits of the maze, so a few changed cells are repaired
+    with Lifelong Planning A* (LPA*) instead of searching the whole maze again.
+    Costs are the same as gridAStar: moving into a cell costs the weight of that cell.
+    LPA* needs every move to cost something, so when the maze has cells with a weight of 0 a move costs weight * cell count + 1
+    internally. Those cells then still add to the cost, while the cheapest path by weight stays the cheapest.
+    After every update the cost is the one a full re-solve finds; when several paths are equally short the path may differ.
+    Moving the start or end point, or lowering a weight below the smallest weight in the maze, starts the search over.
+    So does a repair that would expand more cells than searching from scratch did, e.g. after walling off the start point.
+    :param maze (Maze): The maze to solve, which the session edits in place.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    """
+    def __init__(self, maze, pruneWalls=False):
+        self.maze = maze
+        self.pruneWalls = pruneWalls
+        self.reset()
+
+    def reset(self):
+        """
+        Throws away the search state, so the next solve searches from scratch.
+        """
+        maze = self.maze
+        rows, cols = maze.shape
+        self.blocked = bytearray(maze.walls.tobytes()) if self.pruneWalls else bytearray(rows*cols)
+        self.minWeight = max(int(maze.weights.min()), 0) if maze.weights.size else 0
+        self.scale, self.extra = (1, 0) if self.minWeight else (max(rows*cols, 1), 1) # scale is more than the number of moves on any path
+        self.steps = [weight*self.scale + self.extra for weight in maze.weights.ravel().tolist()]
+        self.hasPoints = bool(maze.starts and maze.ends)
+        self.startPoint, self.endPoint = maze.start, maze.end
+        self.startIndex = self.startPoint[0]*cols + self.startPoint[1]
+        self.endIndex = self.endPoint[0]*cols + self.endPoint[1]
+        self.g = [INF] * (rows*cols)
+        self.rhs = [INF] * (rows*cols)
+        self.frontier = []
+        self.fresh = True
+        if self.hasPoints:
+            self.rhs[self.startIndex] = 0
+            self.push(self.startIndex)
+
+    def estimate(self, index):
+        row, col = divmod(index, self.maze.cols)
+        return (self.minWeight*self.scale + self.extra) * (abs(row-self.endPoint[0]) + abs(col-self.endPoint[1]))
+
+    def push(self, index):
+        best = min(self.g[index], self.rhs[index])
+        heappush(self.frontier, (best + self.estimate(index), best, index))
+
+    def lookAhead(self, index):
+        """
+        The lowest cost of reaching a cell through any of its neighbors.
+        """
+        if index == self.startIndex:
+            return 0
+        if self.blocked[index]:
+            return INF
+        g = self.g
+        return self.steps[index] + min(g[nextIndex] for nextIndex in flatNeighbors(index, *self.maze.shape))
+
+    def updateCell(self, index):
+        if index != self.startIndex:
+            self.rhs[index] = self.lookAhead(index)
+        if self.g[index] != self.rhs[index]:
+            self.push(index)
+
+    def computePath(self, limit=None):
+        """
+        Expands inconsistent cells until the end point's cost is settled.
+        :param limit (int): Give up after expanding this many cells. Default is None (no limit).
+        :return: int, number of cells expanded, bool, whether the end point's cost is settled
+        """
+        g, rhs, frontier = self.g, self.rhs, self.frontier
+        steps, blocked = self.steps, self.blocked
+        rows, cols = self.maze.shape
+        endIndex = self.endIndex
+        expanded = 0
+        while frontier:
+            key, best, index = frontier[0]
+            if g[index] == rhs[index] or best != min(g[index], rhs[index]):
+                heappop(frontier)
+                continue # stale heap entry, the cell was settled or pushed again with another key
+            endBest = min(g[endIndex], rhs[endIndex])
+            if g[endIndex] == rhs[endIndex] and (key, best) >= (endBest, endBest):
+                break
+            if expanded == limit:
+                return expanded, False
+            heappop(frontier)
+            expanded += 1
+            if g[index] > rhs[index]: # the cost went down, pass it on to the neighbors
+                cost = g[index] = rhs[index]
+                for nextIndex in flatNeighbors(index, rows, cols):
+                    if nextIndex != self.startIndex and not blocked[nextIndex] and cost + steps[nextIndex] < rhs[nextIndex]:
+                        rhs[nextIndex] = cost + steps[nextIndex]
+                        self.push(nextIndex)
+            else: # the cost went up, so every neighbor that went through this cell has to look again
+                cost = g[index]
+                g[index] = INF
+                self.updateCell(index)
+                for nextIndex in flatNeighbors(index, rows, cols):
+                    if not blocked[nextIndex] and rhs[nextIndex] == cost + steps[nextIndex]:
+                        self.updateCell(nextIndex)
+        return expanded, True
+
+    def tracePath(self):
+        """
+        Walks back from the end point, always to the neighbor with the lowest cost.
+        :return: list of (row, col) from the start point to the end point
+        """
+        g = self.g
+        rows, cols = self.maze.shape
+        index = self.endIndex
+        path = [divmod(index, cols)]
+        while index != self.startIndex:
+            index = min(flatNeighbors(index, rows, cols), key=g.__getitem__)
+            path.append(divmod(index, cols))
+        path.reverse()
+        return path
+
+    def solve(self):
+        """
+        Brings the shortest path up to date with the maze.
+        :return: SearchResult, where expanded is the number of cells expanded by this call
+        """
+        if not self.hasPoints:
+            return noPath()
+        if self.fresh:
+            expanded, done = self.computePath()
+            self.fresh = False
+            self.fullExpanded = expanded
+        else:
+            expanded, done = self.computePath(max(self.fullExpanded, 1))
+            if not done: # repairing costs more than starting over
+                self.reset()
+                return self.solve()
+        cost = self.g[self.endIndex]
+        if cost == INF:
+            return noPath(expanded)
+        return SearchResult(self.tracePath(), cost // self.scale, expanded)
+
+    def update(self, changes):
+        """
+        Applies edited cells to the maze and repairs the shortest path.
+        :param changes: Iterable of (row, col, text), where text is the new CSV text of the cell, such as "W", "10" or "".
+        :return: SearchResult, see solve
+        """
+        maze = self.maze
+        rows, cols = maze.shape
+        changed = []
+        restart = False
+        for row, col, text in changes:
+            if not (0 <= row < rows and 0 <= col < cols):
+                raise IndexError("Cell (" + str(row) + "," + str(col) + ") is outside of the maze.")
+            kind, weight = classifyCell(text)
+            oldKind = maze.kinds[row, col]
+            maze.kinds[row, col] = kind
+            maze.weights[row, col] = weight
+            maze.walls[row, col] = kind == WALL
+            if text.upper() != "E" and kind == END:
+                maze.endNames[row, col] = text.upper()
+            else:
+                maze.endNames.pop((row, col), None)
+            index = row*cols + col
+            self.steps[index] = weight*self.scale + self.extra
+            if self.pruneWalls:
+                self.blocked[index] = kind == WALL
+            if kind != oldKind and (START in (kind, oldKind) or END in (kind, oldKind)):
+                restart = True # the start or end point moved, so the old search state no longer applies
+            if weight < self.minWeight and not self.blocked[index]:
+                restart = True # the heuristic would overestimate through this cell
+            changed.append(index)
+        if restart:
+            maze.starts, maze.ends = pointsOf(maze, START), pointsOf(maze, END)
+            self.reset()
+        else:
+            for index in changed:
+                self.updateCell(index)
+        return self.solve()
+
+def pointsOf(maze, kind):
+    return [tuple(int(x) for x in p) for p in np.argwhere(maze.kinds == kind)]
+
+def readChanges(path):
+    """
+    Reads a diff of edited cells, one cell per line as "row,col,text" with rows and cols counted from 0.
+    An empty or missing text clears the cell.
+    :param path: The changes CSV file.
+    :return: list of (row, col, text)
+    """
+    changes = []
+    with openText(path) as file:
+        for row in csv.reader(file):
+            if not row or not row[0].strip().lstrip("-").isdigit(): # skip blank lines and a header
+                continue
+            changes.append((int(row[0]), int(row[1]), row[2].strip() if len(row) > 2 else ""))
+    return changes
@@ -0,0 +1,368 @@
+import csv
+import gzip
+import json
+import struct
+import numpy as np
+
+# Cell kinds stored in Maze.kinds
+EMPTY = 0
+WALL = 1
+START = 2
+END = 3
+WEIGHTED = 4
+
+WALL_WEIGHT = 999999 # Cost of entering a wall cell when walls are not pruned from the search
+CHUNK_ROWS = 4096 # Number of rows written to a binary maze file at a time
+CHUNK_CELLS = 2**20 # Number of CSV cells parsed into arrays at a time
+
+# Binary maze files (.maze) are laid out as:
+# - MAZE_MAGIC, then the length of the header as a little-endian uint32
+# - the header, JSON padded with spaces to a multiple of MAZE_ALIGN bytes: {"version", "rows", "cols", "starts", "ends",
+#   "endNames" ([row, col, name] of every numbered exit), "raggedRows", "weightDtype" (NumPy dtype string such as "<i4"),
+#   "kindsOffset", "weightsOffset"}
+# - the kinds grid, one uint8 per cell in row-major order, starting at kindsOffset
+# - the weights grid, one weightDtype per cell in row-major order, starting at weightsOffset
+# Both grids start on a MAZE_ALIGN byte boundary, so they can be memory-mapped straight from the file.
+MAZE_MAGIC = b"UNAVMAZE"
+MAZE_VERSION = 1
+MAZE_ALIGN = 64
+MAZE_EXTENSION = ".maze"
+
+###
+
+def classifyCell(entry):
+    """
+    Classifies the text of a single CSV cell.
+    Symbols are matched case-insensitively, the same way createImage colors them.
+    Numbered exits such as "E1" and "E2" are end points too.
+    :param entry (str): The text of the cell.
+    :return: kind (int), weight (int)
+    """
+    symbol = entry.upper()
+    if symbol == "":
+        return EMPTY, 1
+    if symbol == "W":
+        return WALL, WALL_WEIGHT
+    if symbol == "S":
+        return START, 1
+    if symbol == "E" or (symbol[0] == "E" and symbol[1:].isdigit()):
+        return END, 1
+    if entry.isnumeric():
+        return WEIGHTED, int(entry)
+    return EMPTY, 1 # Unrecognized text is treated as a blank cell
+
+class Maze:
+    """
+    A maze stored as NumPy arrays instead of a 2D list of strings.
+    :param kinds: uint8 grid of cell kinds (EMPTY, WALL, START, END, WEIGHTED).
+    :param weights: int32 grid with the cost of entering each cell.
+    :param starts (list): (row, col) of every start point, in row-major order.
+    :param ends (list): (row, col) of every end point, in row-major order.
+    :param raggedRows (list): (line number, cell count) of every CSV row that did not have as many cells as the first row.
+    :param endNames (dict): (row, col) -> name of every numbered exit, such as "E1".
+    :param walls: Optional boolean grid of wall cells, when it is already known (such as in shared memory). Default is kinds == WALL.
+    """
+    def __init__(self, kinds, weights, starts=None, ends=None, raggedRows=None, endNames=None, walls=None):
+        self.kinds = kinds
+        self.weights = weights
+        self.walls = walls if walls is not None else kinds == WALL
+        if starts is None:
+            starts = [tuple(int(x) for x in p) for p in np.argwhere(kinds == START)]
+        if ends is None:
+            ends = [tuple(int(x) for x in p) for p in np.argwhere(kinds == END)]
+        self.starts = starts
+        self.ends = ends
+        self.raggedRows = raggedRows if raggedRows is not None else []
+        self.endNames = endNames if endNames is not None else dict()
+
+    @property
+    def shape(self):
+        return self.kinds.shape
+
+    @property
+    def rows(self):
+        return self.kinds.shape[0]
+
+    @property
+    def cols(self):
+        return self.kinds.shape[1]
+
+    @property
+    def start(self):
+        """
+        The start point, or (0,0) if there is none.
+        """
+        return self.starts[-1] if self.starts else (0,0)
+
+    @property
+    def end(self):
+        """
+        The end point, or (0,0) if there is none.
+        """
+        return self.ends[-1] if self.ends else (0,0)
+
+    def endName(self, point):
+        """
+        The name of an end point, such as "E1" for a numbered exit, or "E".
+        :param point: (row, col) of the end point.
+        :return: str
+        """
+        return self.endNames.get(tuple(point), "E")
+
+    def crop(self, top, bottom, left, right):
+        """
+        A part of the maze, sharing its arrays.
+        :return: Maze of the rows top to bottom and cols left to right, not including bottom and right
+        """
+        endNames = {(row-top, col-left): name for (row, col), name in self.endNames.items()
+                    if top <= row < bottom and left <= col < right}
+        return Maze(self.kinds[top:bottom, left:right], self.weights[top:bottom, left:right], endNames=endNames)
+
+    def cellText(self, row, col):
+        """
+        Gets the CSV text of a cell.
+        :param row: Row value.
+        :param col: Col value.
+        :return: str
+        """
+        kind = self.kinds[row, col]
+        if kind == WEIGHTED:
+            return str(int(self.weights[row, col]))
+        if kind == END:
+            return self.endName((row, col))
+        return ("", "W", "S", "E")[kind]
+
+    def toRows(self, pathMask=None):
+        """
+        Yields the maze one row at a time as lists of CSV cell text.
+        :param pathMask: Optional boolean grid of path cells, which get "P" concatenated.
+        """
+        symbols = ["", "W", "S", "E", ""]
+        for i in range(self.rows):
+            kindRow = self.kinds[i].tolist()
+            weightRow = self.weights[i].tolist()
+            row = [str(weightRow[j]) if kind == WEIGHTED else symbols[kind] for j, kind in enumerate(kindRow)]
+            if self.endNames and END in kindRow:
+                for j, kind in enumerate(kindRow):
+                    if kind == END:
+                        row[j] = self.endName((i, j))
+            if pathMask is not None:
+                for j in np.flatnonzero(pathMask[i]).tolist():
+                    row[j] += "P"
+            yield row
+
+def rowsToMaze(rows, chunkCells=CHUNK_CELLS, rowCount=None):
+    """
+    Builds a Maze from CSV rows, converting them into arrays a chunk at a time so the rows never have to be held in memory together.
+    The grids are allocated once the first row sets the number of cols, for rowCount rows when it is given,
+    and doubled whenever they fill up. Each cell is copied once from its chunk into the grids.
+    Rows with a different number of cells are recorded in raggedRows, and are padded with blank cells or cut to fit.
+    Blank lines are skipped.
+    :param rows: Iterable of rows of cell text, such as a csv.reader.
+    :param chunkCells (int): Number of cells converted at a time, rounded up to whole rows.
+    :param rowCount (int): Optional number of rows expected, such as the number of lines in the file. Default is None.
+    :return: Maze
+    """
+    colNum = None
+    raggedRows = []
+    starts = []
+    ends = []
+    endNames = dict()
+    rowIndex = 0
+    filled = 0 # rows already copied into kinds and weights
+    cells = []
+    codes = dict() # Maze cells repeat heavily, so each distinct text is only classified once, into a code indexing kindTable and weightTable
+    kindTable = []
+    weightTable = []
+    points = set() # texts of the start and end points
+    for lineNumber, row in enumerate(rows, 1):
+        if not row:
+            continue
+        if colNum is None:
+            colNum = len(row)
+            capacity = max(1, rowCount or chunkCells // colNum)
+            kinds = np.empty((capacity, colNum), dtype=np.uint8)
+            weights = np.empty((capacity, colNum), dtype=np.int32)
+        elif len(row) != colNum:
+            raggedRows.append((getattr(rows, "line_num", lineNumber), len(row))) # csv.reader knows the real line number
+            row = (row + [""] * colNum)[:colNum]
+        try:
+            cells.extend([codes[entry] for entry in row])
+        except KeyError:
+            for entry in row:
+                if entry not in codes:
+                    kind, weight = classifyCell(entry)
+                    codes[entry] = len(kindTable)
+                    kindTable.append(kind)
+                    weightTable.append(weight)
+                    if kind in (START, END):
+                        points.add(entry)
+            cells.extend([codes[entry] for entry in row])
+        if not points.isdisjoint(row): # the points are found while parsing, so the grid is never scanned for them
+            for j, entry in enumerate(row):
+                if entry in points:
+                    if kindTable[codes[entry]] == START:
+                        starts.append((rowIndex, j))
+                    else:
+                        ends.append((rowIndex, j))
+                        if entry.upper() != "E":
+                            endNames[rowIndex, j] = entry.upper()
+        rowIndex += 1
+        if len(cells) >= chunkCells:
+            kinds, weights = fillRows(kinds, weights, filled, cells, kindTable, weightTable)
+            filled = rowIndex
+            cells = []
+    if colNum is None: # no rows at all
+        return Maze(np.zeros((0,0), dtype=np.uint8), np.ones((0,0), dtype=np.int32))
+    if cells:
+        kinds, weights = fillRows(kinds, weights, filled, cells, kindTable, weightTable)
+    kinds.resize((rowIndex, colNum), refcheck=False) # give back the unused rows
+    weights.resize((rowIndex, colNum), refcheck=False)
+    return Maze(kinds, weights, starts=starts, ends=ends, raggedRows=raggedRows, endNames=endNames)
+
+def fillRows(kinds, weights, filled, cells, kindTable, weightTable):
+    """
+    Copies whole rows of cell codes into the grids after the first filled rows, doubling the grids first if they are too small.
+    :return: kinds, weights
+    """
+    capacity, colNum = kinds.shape
+    rows = len(cells) // colNum
+    if filled + rows > capacity:
+        capacity = max(2 * capacity, filled + rows)
+        kinds.resize((capacity, colNum), refcheck=False) # grows in place where it can, but fills the new rows with zeros
+        weights.resize((capacity, colNum), refcheck=False)
+    cells = np.array(cells, dtype=np.int32).reshape(rows, colNum)
+    np.take(np.array(kindTable, dtype=np.uint8), cells, out=kinds[filled:filled+rows])
+    np.take(np.array(weightTable, dtype=np.int32), cells, out=weights[filled:filled+rows])
+    return kinds, weights
+
+def openText(path):
+    """
+    Opens a text file for reading, decompressing it if the name ends in .gz.
+    :param path: The file to open.
+    :return: file
+    """
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, "r", newline="")
+
+def countLines(path):
+    """
+    Counts the lines of a text or gzipped text file, reading it in blocks of bytes.
+    :param path: The file to count.
+    :return: int, one more than the number of newlines
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as file:
+        return 1 + sum(block.count(b"\n") for block in iter(lambda: file.read(2**20), b""))
+
+def readMazeCSV(path, chunkCells=CHUNK_CELLS):
+    """
+    Streams a CSV or gzipped CSV (.csv.gz) file into a Maze.
+    The lines are counted first, so the grids are allocated once at their full size.
+    :param path: The CSV file to read.
+    :param chunkCells (int): Number of cells converted at a time.
+    :return: Maze
+    """
+    rowCount = countLines(path)
+    with openText(path) as file:
+        return rowsToMaze(csv.reader(file), chunkCells, rowCount)
+
+def writeMazeCSV(maze, path):
+    """
+    Writes a Maze as a CSV or gzipped CSV (.csv.gz) file, the same text readMazeCSV reads.
+    :param maze (Maze): The maze to write.
+    :param path: The CSV file to write.
+    """
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt", newline="") as file:
+        csv.writer(file).writerows(maze.toRows())
+
+def alignUp(size):
+    return -(-size // MAZE_ALIGN) * MAZE_ALIGN
+
+def writeMazeBinary(maze, path, chunkRows=CHUNK_ROWS):
+    """
+    Writes a Maze as a binary maze file, see MAZE_MAGIC for the layout.
+    :param maze (Maze): The maze to write.
+    :param path: The .maze file to write.
+    :param chunkRows (int): Number of rows written at a time.
+    """
+    rows, cols = maze.shape
+    weightDtype = np.dtype(np.int32).newbyteorder("<")
+    header = {"version": MAZE_VERSION, "rows": rows, "cols": cols,
+              "starts": [list(point) for point in maze.starts], "ends": [list(point) for point in maze.ends],
+              "endNames": [[row, col, name] for (row, col), name in sorted(maze.endNames.items())],
+              "raggedRows": [list(ragged) for ragged in maze.raggedRows], "weightDtype": weightDtype.str}
+    headerSize = len(json.dumps(header)) + 64 # room for the offsets, which depend on the header size
+    header["kindsOffset"] = alignUp(len(MAZE_MAGIC) + 4 + headerSize)
+    header["weightsOffset"] = header["kindsOffset"] + alignUp(rows * cols)
+    text = json.dumps(header).encode()
+    text += b" " * (header["kindsOffset"] - len(MAZE_MAGIC) - 4 - len(text))
+    with open(path, "wb") as file:
+        file.write(MAZE_MAGIC + struct.pack("<I", len(text)) + text)
+        for top in range(0, rows, chunkRows):
+            file.write(np.ascontiguousarray(maze.kinds[top:top+chunkRows], dtype=np.uint8).tobytes())
+        file.write(b"\0" * (header["weightsOffset"] - header["kindsOffset"] - rows * cols))
+        for top in range(0, rows, chunkRows):
+            file.write(np.ascontiguousarray(maze.weights[top:top+chunkRows], dtype=weightDtype).tobytes())
+
+def readMazeBinary(path):
+    """
+    Loads a binary maze file without parsing it: the grids are memory-mapped, so only the cells that are used get read.
+    The mapping is copy-on-write, so editing the Maze (such as IncrementalSolver does) never changes the file.
+    :param path: The .maze file to read.
+    :return: Maze
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAZE_MAGIC)) != MAZE_MAGIC:
+            raise ValueError(str(path) + " is not a binary maze file.")
+        header = json.loads(file.read(struct.unpack("<I", file.read(4))[0]))
+    if header["version"] > MAZE_VERSION:
+        raise ValueError(str(path) + " was written by a newer version (" + str(header["version"]) + ").")
+    shape = (header["rows"], header["cols"])
+    weightDtype = np.dtype(header["weightDtype"])
+    if shape[0] * shape[1] == 0: # NumPy can not map an empty array
+        kinds, weights = np.zeros(shape, dtype=np.uint8), np.ones(shape, dtype=np.int32)
+    else:
+        kinds = np.memmap(path, dtype=np.uint8, mode="c", offset=header["kindsOffset"], shape=shape)
+        weights = np.memmap(path, dtype=weightDtype, mode="c", offset=header["weightsOffset"], shape=shape)
+        if weightDtype != np.int32: # the solvers expect native int32 weights
+            weights = weights.astype(np.int32)
+    return Maze(kinds, weights, starts=[tuple(point) for point in header["starts"]], ends=[tuple(point) for point in header["ends"]],
+                raggedRows=[tuple(ragged) for ragged in header["raggedRows"]],
+                endNames={(row, col): name for row, col, name in header["endNames"]})
+
+def readMaze(path):
+    """
+    Reads a maze file of any supported format: a binary maze file (.maze), or a CSV or gzipped CSV file.
+    :param path: The maze file to read.
+    :return: Maze
+    """
+    if str(path).endswith(MAZE_EXTENSION):
+        return readMazeBinary(path)
+    return readMazeCSV(path)
+
+def csvToMaze(f):
+    """
+    Converts CSV file into a Maze.
+    :param f: The CSV file to be converted.
+    :return: Maze
+    """
+    return readMazeCSV(f.name)
+
+def readGoals(path):
+    """
+    Reads a goal list, one goal per line as "row,col" or "row,col,name" with rows and cols counted from 0.
+    :param path: The goals CSV file.
+    :return: list of ((row, col), name), where name defaults to "G" and the line number
+    """
+    goals = []
+    with openText(path) as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if not row or not row[0].strip().lstrip("-").isdigit(): # skip blank lines and a header
+                continue
+            name = row[2].strip() if len(row) > 2 and row[2].strip() else "G" + str(reader.line_num)
+            goals.append(((int(row[0]), int(row[1])), name))
+    return goals
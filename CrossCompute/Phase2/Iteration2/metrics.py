@@ -0,0 +1,97 @@
+import json
+import sys
+from contextlib import contextmanager
+from os.path import join
+from time import perf_counter
+try:
+    import resource
+except ImportError: # not available on Windows, where peak memory is left out
+    resource = None
+
+# Only the standard library is used here, so timing a run adds nothing to its startup
+
+METRICS_NAME = "metrics.json"
+PROFILE_NAME = "profile.prof"
+
+collector = None # The Metrics of the run in progress in this process, or None when nothing is being measured
+
+###
+
+class Metrics:
+    """
+    Times the stages of a run and records the peak memory of the process after each one, along with counters such as the
+    number of cells a search expanded.
+    Peak memory is the high-water mark of the whole process so far (ru_maxrss), so the stage that raised it is the one
+    whose peak is higher than the stage before it.
+    """
+    def __init__(self):
+        self.startTime = perf_counter()
+        self.stages = []
+        self.values = dict()
+
+    def addStage(self, name, seconds):
+        self.stages.append({"name": name, "seconds": round(seconds, 6), "peakRssBytes": peakMemory()})
+
+    def toDict(self):
+        return {**self.values, "stages": self.stages, "totalSeconds": round(perf_counter() - self.startTime, 6), "peakRssBytes": peakMemory()}
+
+def peakMemory():
+    """
+    The most memory the process has held at once.
+    :return: int, bytes, or None where it can not be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # macOS counts bytes, Linux kilobytes
+
+def startMetrics():
+    """
+    Starts measuring a run in this process, throwing away the measurements of any earlier run.
+    :return: Metrics
+    """
+    global collector
+    collector = Metrics()
+    return collector
+
+def stopMetrics():
+    """
+    Stops measuring.
+    :return: Metrics of the run, or None if nothing was being measured
+    """
+    global collector
+    metrics, collector = collector, None
+    return metrics
+
+@contextmanager
+def stage(name):
+    """
+    Times the code inside a with block as a stage of the run being measured. Does nothing when no run is being measured.
+    :param name (str): The name of the stage, such as "parse" or "search".
+    """
+    metrics = collector
+    if metrics is None:
+        yield
+        return
+    startTime = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.addStage(name, perf_counter() - startTime)
+
+def record(**values):
+    """
+    Records values about the run being measured, such as expanded=120. Does nothing when no run is being measured.
+    """
+    if collector is not None:
+        collector.values.update(values)
+
+def writeMetrics(metrics, folder, name=METRICS_NAME):
+    """
+    Writes the measurements of a run as JSON.
+    :param metrics (Metrics): The measurements.
+    :param folder: The output folder.
+    :param name: The name of the JSON file.
+    """
+    with open(join(folder, name), "w") as file:
+        json.dump(metrics.toDict(), file, indent=2)
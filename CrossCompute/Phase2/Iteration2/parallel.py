@@ -0,0 +1,55 @@
+import json
+from multiprocessing import Pipe, Process
+
+# Shared by batch.py, pipeline.py and service.py, which solve many mazes with worker processes
+
+###
+
+def startWorker(target, *args):
+    """
+    Starts a daemon worker process that talks to its parent over a pipe, so it dies with the parent.
+    :param target: The function the worker runs, called with the worker's end of the pipe followed by args.
+    :return: worker (Process), the parent's end of the pipe
+    """
+    parentEnd, childEnd = Pipe()
+    worker = Process(target=target, args=(childEnd,) + args, daemon=True)
+    worker.start()
+    childEnd.close()
+    return worker, parentEnd
+
+def countStatuses(results):
+    """
+    Counts how many mazes ended in each status, such as "solved", "unsolved" or "failed".
+    :param results (list): dicts with the "status" of every maze.
+    :return: dict of status -> number of mazes
+    """
+    counts = dict()
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+def writeSummary(results, completeName, wallTime, **values):
+    """
+    Writes the results of a run of many mazes as JSON, with the number of mazes in each status.
+    :param results (list): dicts with the "status" of every maze.
+    :param completeName: The file to write.
+    :param wallTime (float): Seconds the whole run took.
+    :param values: More values of the summary, written after wallSeconds.
+    :return: summary (dict)
+    """
+    summary = {"mazes": len(results), "counts": countStatuses(results), "wallSeconds": round(wallTime, 4), **values, "results": results}
+    with open(completeName, "w") as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+def printSummary(summary, completeName):
+    """
+    Prints every maze that was not solved, then the number of mazes in each status.
+    :param summary (dict): The summary from writeSummary.
+    :param completeName: The file the summary was written to.
+    """
+    for result in summary["results"]:
+        if result["status"] != "solved":
+            print(result["name"] + ": " + result["status"] + (" - " + result["message"] if result["message"] else ""))
+    print(str(summary["mazes"]) + " mazes in " + str(summary["wallSeconds"]) + " s: " +
+          ", ".join(str(count) + " " + status for status, count in sorted(summary["counts"].items())) + ". Summary written to " + completeName + ".")
@@ -0,0 +1,223 @@
+import argparse
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from os.path import dirname, isdir, join
+from time import perf_counter
+import run
+import parallel
+from batch import batchesFromConfig, batchesFromFolder
+
+SUMMARY_NAME = "pipelineSummary.json"
+QUEUE_SIZE = 8 # Mazes each stage may have waiting for the next one, so a fast stage can not run far ahead of a slow one
+STAGES = ("parse", "solve", "render", "write")
+
+###
+
+class StageStats:
+    """
+    Counts the mazes a stage of the pipeline handled, the seconds its threads were busy, and how many mazes were waiting
+    in its input queue each time it took one.
+    """
+    def __init__(self, name, inputQueue=None):
+        self.name = name
+        self.inputQueue = inputQueue
+        self.items = 0
+        self.busySeconds = 0
+        self.depths = []
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Takes the next maze from the input queue, recording how many were waiting.
+        :return: the item, or None at the end of the stream
+        """
+        depth = self.inputQueue.qsize()
+        item = self.inputQueue.get()
+        if item is not None:
+            with self.lock:
+                self.depths.append(depth)
+        return item
+
+    def add(self, seconds):
+        with self.lock:
+            self.items += 1
+            self.busySeconds += seconds
+
+    def toDict(self, wallTime):
+        return {"items": self.items, "busySeconds": round(self.busySeconds, 4),
+                "mazesPerSecond": round(self.items / wallTime, 2) if wallTime else None,
+                "meanQueue": round(sum(self.depths) / len(self.depths), 2) if self.depths else 0, "maxQueue": max(self.depths, default=0)}
+
+def solveWorker(maze, completeName, outputFolder, mode, query, pruneWalls):
+    """
+    Searches a maze in a solver process.
+    :return: path (list of (row, col), or None), counts (dict of the cells "expanded", None for NetworkX, and the
+    "abstractNodes" HPA* expanded)
+    """
+    path, search = run.findPath(maze, completeName, outputFolder, mode, query, pruneWalls)
+    if search is None:
+        return path, {"expanded": None, "abstractNodes": None}
+    return path, {"expanded": search.expanded, "abstractNodes": search.abstractNodes}
+
+def runPipelined(batches, workers=None, renderers=1, writers=2, queueSize=QUEUE_SIZE, options=None):
+    """
+    Solves and draws many mazes as a stream: parsing, solving, rendering and PNG encoding and writing are separate stages
+    joined by bounded queues, so while one maze is being solved the ones before it are being drawn and written.
+    Solving runs in worker processes, the other stages in threads (Pillow encodes PNGs without holding the GIL).
+    Every mazeImage.png is the same one run.py draws.
+    :param batches (list): (name, maze file, output folder) of every maze, see batch.py.
+    :param workers (int): Number of solver processes. Default is the number of CPUs.
+    :param renderers (int): Number of render threads.
+    :param writers (int): Number of PNG encode and write threads.
+    :param queueSize (int): Mazes that may wait between two stages.
+    :param options (dict): The solver, pruneWalls and query of run.solveMazeFile. Default is run.optionsFromEnvironment().
+    Queries "single" and "nearest" are supported, the image is always one mazeImage.png and nothing is cached.
+    :return: results (list of dicts like batch.runBatches), stats (dict of StageStats by stage name), wallTime (float)
+    """
+    from analysis import analyzeMaze
+    from maze import readMaze
+    from render import determineScale, renderImage, labelWeights
+    if options is None:
+        options = run.optionsFromEnvironment()
+    solver, pruneWalls, query = options.get("solver", "networkx"), options.get("pruneWalls", False), options.get("query", "single")
+    if query not in ("single", "nearest"):
+        raise ValueError("The pipeline solves the single and nearest queries, not " + query + ".")
+    mode = run.searchMode(solver, query)
+    workers = max(1, workers or os.cpu_count() or 1)
+    solveQueue, renderQueue, writeQueue = queue.Queue(queueSize), queue.Queue(queueSize), queue.Queue(queueSize)
+    stats = {"parse": StageStats("parse"), "solve": StageStats("solve", solveQueue),
+             "render": StageStats("render", renderQueue), "write": StageStats("write", writeQueue)}
+    results = [None] * len(batches)
+    startTimes = dict()
+
+    def finish(index, status, message="", counts=None):
+        name, completeName, output_folder = batches[index]
+        results[index] = {"name": name, "input": completeName, "output": output_folder, "status": status, "message": message.strip(),
+                          "seconds": round(perf_counter() - startTimes[index], 4), "mode": mode if status != "failed" else None,
+                          "expanded": None, "abstractNodes": None, **(counts or dict())}
+
+    def guarded(stage, index, work):
+        try:
+            work()
+        except Exception as error: # one broken maze must not stop the stream
+            finish(index, "failed", stage + ": " + type(error).__name__ + ": " + str(error))
+
+    def parseStage():
+        for index, (name, completeName, output_folder) in enumerate(batches):
+            startTimes[index] = startTime = perf_counter()
+            def parse():
+                maze = readMaze(completeName)
+                summary = analyzeMaze(maze)
+                validation = run.validateMaze(maze, query, None, summary)
+                stats["parse"].add(perf_counter() - startTime)
+                if not validation[0]:
+                    finish(index, "unsolved", validation[1])
+                else:
+                    solveQueue.put((index, maze, summary))
+            guarded("parse", index, parse)
+
+    def solveStage(executor):
+        while True:
+            item = stats["solve"].take()
+            if item is None:
+                return
+            index, maze, summary = item
+            name, completeName, output_folder = batches[index]
+            startTime = perf_counter()
+            def solve():
+                os.makedirs(output_folder, exist_ok=True)
+                path, counts = executor.submit(solveWorker, maze, completeName, output_folder, mode, query, pruneWalls).result()
+                stats["solve"].add(perf_counter() - startTime)
+                if path is None:
+                    finish(index, "unsolved", run.noPathMessage(query), counts)
+                else:
+                    renderQueue.put((index, maze, summary, path, counts))
+            guarded("solve", index, solve)
+
+    def renderStage():
+        while True:
+            item = stats["render"].take()
+            if item is None:
+                return
+            index, maze, summary, path, counts = item
+            startTime = perf_counter()
+            def render():
+                pathMask = run.mazeSolution(maze, path)
+                minAndMax = summary.minAndMax(maze, pathMask)
+                scale = determineScale(maze, pathMask, minAndMax)
+                img = renderImage(maze, pathMask, scale, minAndMax)
+                labelWeights(img, maze, pathMask, scale)
+                stats["render"].add(perf_counter() - startTime)
+                writeQueue.put((index, img, counts))
+            guarded("render", index, render)
+
+    def writeStage():
+        while True:
+            item = stats["write"].take()
+            if item is None:
+                return
+            index, img, counts = item
+            startTime = perf_counter()
+            def write():
+                img.save(join(batches[index][2], "mazeImage.png"))
+                stats["write"].add(perf_counter() - startTime)
+                finish(index, "solved", "", counts)
+            guarded("write", index, write)
+
+    startTime = perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        parsers = [threading.Thread(target=parseStage)]
+        solvers = [threading.Thread(target=solveStage, args=(executor,)) for _ in range(workers)] # one maze in flight per process
+        renderThreads = [threading.Thread(target=renderStage) for _ in range(renderers)]
+        writeThreads = [threading.Thread(target=writeStage) for _ in range(writers)]
+        stages = [(parsers, solveQueue), (solvers, renderQueue), (renderThreads, writeQueue), (writeThreads, None)]
+        for threads, outputQueue in stages:
+            for thread in threads:
+                thread.start()
+        for (threads, outputQueue), (nextThreads, nextQueue) in zip(stages, stages[1:]):
+            for thread in threads:
+                thread.join()
+            for _ in nextThreads: # every thread of the next stage stops at its own end marker
+                outputQueue.put(None)
+        for thread in writeThreads:
+            thread.join()
+    return results, stats, perf_counter() - startTime
+
+def writeSummary(results, stats, completeName, wallTime):
+    """
+    Writes the results of a pipelined run as JSON, with the throughput and queue depths of every stage.
+    :param results (list): The results from runPipelined.
+    :param stats (dict): The StageStats from runPipelined.
+    :param completeName: The file to write.
+    :param wallTime (float): Seconds the whole run took.
+    :return: summary (dict), see parallel.writeSummary
+    """
+    return parallel.writeSummary(results, completeName, wallTime, mazesPerSecond=round(len(results) / wallTime, 2) if wallTime else None,
+                                stages={name: stats[name].toDict(wallTime) for name in STAGES})
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve and draw a stream of mazes with overlapping stages.")
+    parser.add_argument("source", help="automate.yml to run its batches, or a folder of mazes")
+    parser.add_argument("--output", help="folder for the outputs of a folder of mazes (default: <source>/output)")
+    parser.add_argument("--workers", type=int, help="number of solver processes (default: number of CPUs)")
+    parser.add_argument("--renderers", type=int, default=1, help="number of render threads (default: 1)")
+    parser.add_argument("--writers", type=int, default=2, help="number of PNG encode and write threads (default: 2)")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="mazes that may wait between two stages (default: " + str(QUEUE_SIZE) + ")")
+    parser.add_argument("--summary", help="where to write the summary (default: " + SUMMARY_NAME + " next to the source)")
+    args = parser.parse_args()
+    if isdir(args.source):
+        batches = batchesFromFolder(args.source, args.output or join(args.source, "output"))
+        summaryName = args.summary or join(args.source, SUMMARY_NAME)
+    else:
+        batches = batchesFromConfig(args.source)
+        summaryName = args.summary or join(dirname(os.path.abspath(args.source)), SUMMARY_NAME)
+    results, stats, wallTime = runPipelined(batches, args.workers, args.renderers, args.writers, args.queue)
+    summary = writeSummary(results, stats, summaryName, wallTime)
+    for name in STAGES:
+        stage = summary["stages"][name]
+        print(name.ljust(7) + str(stage["items"]).rjust(6) + " mazes  " + format(stage["busySeconds"], ".2f").rjust(8) + " s busy  "
+              + str(stage["mazesPerSecond"]).rjust(8) + " mazes/s  queue mean " + str(stage["meanQueue"]) + " max " + str(stage["maxQueue"]))
+    parallel.printSummary(summary, summaryName)
@@ -0,0 +1,205 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from multiprocessing import Pool, current_process
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from maze import Maze, openText, readMaze
+from route import routeOf, ROUTE_FORMATS
+from solver import SearchGrids, jumpGrids
+
+SOLVERS = ("grid", "jps", "bidirectional", "hpa")
+CHUNK_QUERIES = 16 # Queries handed to a worker at a time
+
+workerMaze = None # The Maze a query worker answers queries on, attached to the shared grids
+workerGrids = None # The SearchGrids of workerMaze, read by every search of a query worker
+workerSettings = None # (solver, pruneWalls, route format) of a query worker
+workerIndex = None # The HPA* index of a query worker, when solving with "hpa"
+workerBlocks = [] # The shared memory blocks a query worker has attached, kept open for as long as workerMaze is used
+
+###
+
+class SharedMaze:
+    """
+    The cell kinds, weights and walls of a maze copied once into shared memory blocks, which worker processes attach to
+    instead of each holding a copy of the maze. Use it in a with block, which removes the blocks at the end.
+    :param maze (Maze): The maze to share.
+    :param arrays (dict): More named arrays to share along with the maze, such as the grids of solver.jumpGrids or the
+    arrays of an HPA* index. Default is none.
+    """
+    GRIDS = ("kinds", "weights", "walls")
+
+    def __init__(self, maze, arrays=None):
+        self.blocks = dict()
+        self.handle = {"maze": dict(), "arrays": dict()}
+        for name in self.GRIDS:
+            self.share("maze", name, getattr(maze, name))
+        for name, array in (arrays or dict()).items():
+            self.share("arrays", name, array)
+        self.maze, self.arrays = attachMaze(self.handle, self.blocks)
+
+    def share(self, group, name, grid):
+        block = SharedMemory(create=True, size=max(grid.nbytes, 1))
+        self.blocks[block.name] = block
+        np.ndarray(grid.shape, dtype=grid.dtype, buffer=block.buf)[:] = grid
+        self.handle[group][name] = (block.name, grid.dtype.str, grid.shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        self.maze = self.arrays = None # the arrays over the blocks must be gone before the blocks can close
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+def attachMaze(handle, blocks=None):
+    """
+    Builds a Maze on the shared grids of a SharedMaze without copying them.
+    :param handle (dict): SharedMaze.handle.
+    :param blocks (dict): The blocks by name when they are already open in this process. Default is to attach to them by name,
+    adding them to workerBlocks.
+    :return: Maze, with no start or end points (every query has its own), and the other shared arrays (dict)
+    """
+    def attach(blockName, dtype, shape):
+        if blocks is None:
+            block = SharedMemory(name=blockName)
+            workerBlocks.append(block)
+        else:
+            block = blocks[blockName]
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    grids = {name: attach(*entry) for name, entry in handle["maze"].items()}
+    arrays = {name: attach(*entry) for name, entry in handle["arrays"].items()}
+    return Maze(grids["kinds"], grids["weights"], starts=[], ends=[], walls=grids["walls"]), arrays
+
+def readQueries(completeName):
+    """
+    Reads queries one at a time, one "startRow,startCol,endRow,endCol" per line with rows and cols counted from 0.
+    Blank lines and a header are skipped.
+    :param completeName: The queries CSV (or .csv.gz) file.
+    :return: iterator of (line number, (startRow, startCol), (endRow, endCol))
+    """
+    with openText(completeName) as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if len(row) < 4 or not row[0].strip().lstrip("-").isdigit():
+                continue
+            startRow, startCol, endRow, endCol = (int(value) for value in row[:4])
+            yield reader.line_num, (startRow, startCol), (endRow, endCol)
+
+def startQueryWorker(handle, solver, pruneWalls, route):
+    """
+    Attaches a worker to the shared maze, and to the shared jump grids or HPA* index of its solver.
+    """
+    global workerMaze, workerGrids, workerSettings, workerIndex
+    workerMaze, arrays = attachMaze(handle)
+    workerGrids = SearchGrids(workerMaze, arrays if solver == "jps" else None)
+    workerSettings = (solver, pruneWalls, route)
+    if solver == "hpa":
+        from hierarchy import sharedIndex
+        workerIndex = sharedIndex(workerMaze, arrays)
+
+def stopQueryWorker():
+    """
+    Lets go of the shared maze, so its blocks can be closed.
+    """
+    global workerMaze, workerGrids, workerIndex
+    workerMaze = workerGrids = workerIndex = None
+    for block in workerBlocks:
+        block.close()
+    workerBlocks.clear()
+
+def answerQuery(query):
+    """
+    Solves one query on the worker's maze. The search reads the shared grids in place and only keeps the cells it reaches.
+    :param query: (line number, start point, end point) from readQueries.
+    :return: dict with the "line", "start", "end", whether it was "solved", the route (see route.routeOf) and cells "expanded",
+    or an "error"
+    """
+    from solver import gridAStar, jumpPointSearch, bidirectionalSearch
+    lineNumber, startPoint, endPoint = query
+    solver, pruneWalls, route = workerSettings
+    maze = workerMaze
+    answer = {"line": lineNumber, "start": list(startPoint), "end": list(endPoint)}
+    for row, col in (startPoint, endPoint):
+        if not (0 <= row < maze.rows and 0 <= col < maze.cols):
+            answer["error"] = "(" + str(row) + "," + str(col) + ") is outside of the maze."
+            return answer
+    if solver == "hpa":
+        search = workerIndex.query(startPoint, endPoint, pruneWalls=pruneWalls, grids=workerGrids)
+    else:
+        search = {"grid": gridAStar, "jps": jumpPointSearch, "bidirectional": bidirectionalSearch}[solver](maze, startPoint, endPoint,
+                                                                                                         pruneWalls=pruneWalls, grids=workerGrids)
+    answer["solved"] = search.found
+    if search.found:
+        answer.update(routeOf(maze, search.path, route))
+    answer["expanded"] = search.expanded
+    if search.abstractNodes is not None:
+        answer["abstractNodes"] = search.abstractNodes
+    return answer
+
+def answerQueries(completeName, queries, workers=None, solver="grid", pruneWalls=False, route="moves", chunkSize=CHUNK_QUERIES):
+    """
+    Answers many start and end point queries on one maze in parallel. The maze is read once and shared with every worker
+    process through shared memory, so however many workers there are, there is only one copy of it. Every search reads the
+    shared grids in place and keeps only the cells it reaches, so a short query on a large maze takes as long as its path.
+    Answers are yielded as they are found, which is not the order of the queries: each one says which line it answers.
+    :param completeName: The maze file (.csv, .csv.gz or .maze). Its start and end points are not used.
+    :param queries: Iterable of queries, see readQueries.
+    :param workers (int): Number of worker processes. Default is the number of CPUs, or 1 inside a daemon process
+    (such as a batch worker), which is not allowed to start processes of its own.
+    :param solver (str): One of SOLVERS. "hpa" builds or loads the index next to the maze once, before the workers start,
+    and "jps" builds its jump grids once. Both are shared with the maze.
+    :param pruneWalls (bool): Whether walls are left out of the search entirely.
+    :param route (str): The form of every path, one of route.ROUTE_FORMATS.
+    :param chunkSize (int): Queries handed to a worker at a time.
+    :return: iterator of dict, see answerQuery
+    """
+    if solver not in SOLVERS:
+        raise ValueError("Unknown solver " + solver + ", expected one of " + ", ".join(SOLVERS) + ".")
+    if route not in ROUTE_FORMATS:
+        raise ValueError("Unknown route format " + route + ", expected one of " + ", ".join(ROUTE_FORMATS) + ".")
+    maze = readMaze(completeName)
+    arrays = None
+    if solver == "jps":
+        arrays = jumpGrids(maze, pruneWalls) # built once here instead of by every search
+    elif solver == "hpa":
+        from hierarchy import loadIndex
+        arrays = loadIndex(completeName, maze).sharedArrays() # built with every CPU if there is no index yet
+    with SharedMaze(maze, arrays) as shared:
+        maze = arrays = None # the parsed maze is dropped once it is in shared memory
+        workers = 1 if current_process().daemon else workers or os.cpu_count() or 1
+        settings = (shared.handle, solver, pruneWalls, route)
+        if workers == 1:
+            startQueryWorker(*settings)
+            try:
+                for query in queries:
+                    yield answerQuery(query)
+            finally:
+                stopQueryWorker()
+            return
+        with Pool(workers, initializer=startQueryWorker, initargs=settings) as pool:
+            yield from pool.imap_unordered(answerQuery, queries, chunksize=chunkSize)
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer many start and end point queries on one maze in parallel.")
+    parser.add_argument("maze", help="maze file (.csv, .csv.gz or .maze)")
+    parser.add_argument("queries", help="CSV of queries, one startRow,startCol,endRow,endCol per line")
+    parser.add_argument("--output", help="JSON lines file to stream the answers to (default: standard output)")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--solver", choices=SOLVERS, default="grid", help="search to use (default: grid)")
+    parser.add_argument("--walls", choices=("weighted", "impassable"), default="weighted", help="whether walls can be passed at their weight (default: weighted)")
+    parser.add_argument("--route", choices=ROUTE_FORMATS, default="moves", help="form of every path (default: moves)")
+    args = parser.parse_args()
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for answer in answerQueries(args.maze, readQueries(args.queries), args.workers, args.solver, args.walls == "impassable", args.route):
+            output.write(json.dumps(answer) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,148 @@
+from functools import lru_cache
+from math import ceil
+import numpy as np
+from PIL import Image
+from PIL import ImageDraw
+from PIL import ImageFont
+from maze import EMPTY, WALL, START, END, WEIGHTED
+
+WHITE = (255,255,255)
+BLACK = (0,0,0)
+BLUE = (137,207,240)
+GREEN = (0,255,0)
+RED = (255,0,0)
+GRAY = (225,225,225)
+
+MIN_LABEL_SCALE = 10 # labels in cells smaller than this many pixels are too small to read, so they are skipped
+
+###
+
+def getMinAndMax(maze, pathMask=None):
+    """
+    Gets the minimum and maximum weight values from a maze.
+    Weighted cells on the path are drawn as path cells, so they are left out.
+    :param maze (Maze): The maze to get the information from.
+    :param pathMask: Optional boolean grid of path cells.
+    """
+    weighted = (maze.kinds == WEIGHTED) & (maze.weights > 1)
+    if pathMask is not None:
+        weighted &= ~pathMask
+    if not weighted.any(): # If there are no weighted cells, we return 0 for both
+        return 0,0
+    values = maze.weights[weighted]
+    return int(values.min()),int(values.max())
+
+def cellColors(maze, pathMask, minAndMax=None):
+    """
+    Looks up the fill and outline color of every cell.
+    Cells that are never colored (weights of 0 or 1) keep a white fill and a white outline.
+    :param maze (Maze): The maze to color.
+    :param pathMask: Boolean grid of path cells.
+    :param minAndMax: The (min, max) weights the browns are scaled between. Default is getMinAndMax of this maze,
+    but a part of a maze has to use the ones of the whole maze.
+    :return: fill, outline as int grids of shape (rows, cols, 3)
+    """
+    kinds = maze.kinds
+    fill = np.empty(maze.shape + (3,), dtype=np.int64)
+    fill[:] = WHITE
+    minWeight,maxWeight = minAndMax if minAndMax is not None else getMinAndMax(maze, pathMask)
+    brown = (kinds == WEIGHTED) & (maze.weights > 1) & ~pathMask
+    if brown.any():
+        red = 50+(255-(255 * (maze.weights[brown].astype(np.int64)-minWeight) // max(maxWeight-minWeight, 1))) # scale red from 0 - 255 based on min and max values | add 50 to the scaled value to ensure lightest brown instead of black if value is 0
+        fill[brown] = np.stack([red, red // 2, red // 4], axis=-1) # green is red / 2 and blue is green / 2 to make brown
+    fill[kinds == WALL] = BLACK
+    fill[kinds == START] = GREEN
+    fill[kinds == END] = RED
+    fill[pathMask] = BLUE
+
+    outline = (fill * .85).astype(np.int64) # color darker shade of color to discern the outline
+    empty = (kinds == EMPTY) & ~pathMask
+    outline[empty] = GRAY # empty cells get a gray outline instead
+    unpainted = (kinds == WEIGHTED) & (maze.weights <= 1) & ~pathMask
+    outline[unpainted] = WHITE
+    return fill, outline
+
+def renderImage(maze, pathMask, scale, minAndMax=None):
+    """
+    Create an image of the maze by tiling every cell as a scale x scale square with a one pixel outline.
+    The whole image is built as a NumPy array and converted to a PIL image in one step.
+    :param maze (Maze): The maze to create an image from.
+    :param pathMask: Boolean grid of path cells.
+    :param scale: The width and height of each cell in pixels.
+    :param minAndMax: The (min, max) weights to color with, see cellColors.
+    :return: PIL image
+    """
+    fill, outline = cellColors(maze, pathMask, minAndMax)
+    fill = np.clip(fill, 0, 255).astype(np.uint8) # PIL clamps out of range channels, so we do the same
+    outline = np.clip(outline, 0, 255).astype(np.uint8)
+    border = np.zeros(scale, dtype=bool)
+    border[[0, -1]] = True
+    tile = border[:, None] | border[None, :] # True on the outline pixels of a single cell
+    rows, cols = maze.shape
+    pixels = np.where(tile[None, :, None, :, None], outline[:, None, :, None, :], fill[:, None, :, None, :])
+    return Image.fromarray(pixels.reshape(rows*scale, cols*scale, 3), mode="RGB")
+
+@lru_cache(maxsize=None)
+def loadFont(size):
+    """
+    Loads the label font, once per process for each size.
+    :param size: The font size in pixels.
+    :return: FreeTypeFont
+    """
+    try:
+        return ImageFont.truetype("arial.ttf",size)
+    except OSError:
+        return ImageFont.truetype("NotoSans[wght].ttf", size)
+
+@lru_cache(maxsize=4096)
+def labelGlyph(text, scale):
+    """
+    Renders a label once so it can be pasted into every cell that has it.
+    The label is drawn with the same sub-pixel offset that ImageDraw.text uses inside a cell.
+    :param text (str): The label.
+    :param scale: The width and height of each cell in pixels.
+    :return: mask (L image or None if nothing is drawn), (x, y) offset of the mask from the top left of the cell
+    """
+    font = loadFont(scale*.75)
+    left, top, right, bottom = font.getbbox(text)
+    pad = scale # room for glyphs that reach outside of their cell
+    glyph = Image.new("L", (2*pad + scale + ceil(right), 2*pad + scale + ceil(bottom)), 0)
+    ImageDraw.Draw(glyph).text((pad+scale*.25,pad+scale*.1),text,font=font,fill=255)
+    bbox = glyph.getbbox()
+    if bbox is None:
+        return None, (0,0)
+    return glyph.crop(bbox), (bbox[0]-pad, bbox[1]-pad)
+
+def labelWeights(img, maze, pathMask, scale):
+    """
+    Label the weights, start and end point of a maze image.
+    Every distinct label is rendered once and then pasted into its cells.
+    :param img: The image to be labelled.
+    :param maze (Maze): The maze the image was created from.
+    :param pathMask: Boolean grid of path cells.
+    :param scale: The width and height of each cell in pixels.
+    """
+    if scale < MIN_LABEL_SCALE:
+        return
+    kinds = maze.kinds
+    unvisited = ((kinds == WEIGHTED) & (maze.weights > 1)) | (kinds == START) | (kinds == END)
+    labelled = np.where(pathMask, kinds != EMPTY, unvisited) # path cells only keep the label of what they pass through
+    for i, v in zip(*np.nonzero(labelled)): # row by row, so overlapping labels stack in the same order as before
+        mask, (x, y) = labelGlyph(maze.cellText(i,v), scale)
+        if mask is not None:
+            img.paste(BLACK, (int(v)*scale+x, int(i)*scale+y), mask)
+
+def determineScale(maze, pathMask=None, minAndMax=None):
+    """
+    Picks the width and height of each cell in pixels.
+    :param maze (Maze): The maze being drawn.
+    :param pathMask: Optional boolean grid of path cells, whose weights are not drawn.
+    :param minAndMax: The (min, max) weights of the drawing when they are already known. Default is getMinAndMax of this maze.
+    :return: int, at least 1
+    """
+    mazeMin,mazeMax = minAndMax if minAndMax is not None else getMinAndMax(maze, pathMask)
+    maxScale = 50
+    scale = maxScale - (maxScale * (mazeMax//maxScale))
+    if scale < 1: # the formula reaches 0 at a weight of 50 and goes negative after, which PIL can not draw
+        scale = maxScale
+    return scale
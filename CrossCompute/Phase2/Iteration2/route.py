@@ -0,0 +1,104 @@
+import json
+import re
+from os.path import join
+import numpy as np
+
+ROUTE_NAME = "mazePath.json"
+ROUTE_FORMATS = ("coords", "moves", "runs")
+MOVES = {(-1, 0): "U", (1, 0): "D", (0, -1): "L", (0, 1): "R"}
+MOVE_CODES = np.frombuffer(b"?U?L?R?D?", dtype=np.uint8) # indexed by 3 * (row step + 1) + col step + 1
+
+###
+
+def pathSteps(path):
+    """
+    The (row, col) steps between the cells of a path, as an int array of shape (len(path) - 1, 2).
+    """
+    return np.diff(np.asarray(path, dtype=np.int64).reshape(-1, 2), axis=0)
+
+def pathCost(maze, path):
+    """
+    The total weight of a path, the sum of the weights of every cell entered after the first.
+    :param maze (Maze): The maze the path is in.
+    :param path (list): (row, col) of every cell of the path.
+    :return: int
+    """
+    if len(path) < 2:
+        return 0
+    cells = np.asarray(path[1:], dtype=np.int64)
+    return int(maze.weights[cells[:, 0], cells[:, 1]].astype(np.int64).sum())
+
+def encodeMoves(path):
+    """
+    Writes a path as one letter per step: U, D, L or R, such as "RRDDDL".
+    :param path (list): (row, col) of every cell of the path, each next to the one before.
+    :return: str
+    """
+    steps = pathSteps(path)
+    if len(steps) and np.abs(steps).sum(axis=1).max() != 1:
+        raise ValueError("Every cell of a path must be next to the one before it.")
+    return MOVE_CODES[3 * (steps[:, 0] + 1) + steps[:, 1] + 1].tobytes().decode("ascii")
+
+def encodeRuns(moves):
+    """
+    Run-length encodes a move string, writing the length before every run longer than one step: "RRDDDL" is "2R3DL".
+    :param moves (str): Moves from encodeMoves.
+    :return: str
+    """
+    if not moves:
+        return ""
+    letters = np.frombuffer(moves.encode("ascii"), dtype=np.uint8)
+    starts = np.concatenate(([0], np.flatnonzero(letters[1:] != letters[:-1]) + 1))
+    lengths = np.diff(np.append(starts, len(letters))).tolist()
+    return "".join((str(length) if length > 1 else "") + moves[start] for start, length in zip(starts.tolist(), lengths))
+
+def decodeMoves(start, moves):
+    """
+    Follows a move string or run-length encoded moves from the start cell.
+    :param start: (row, col) of the first cell.
+    :param moves (str): Moves from encodeMoves or encodeRuns.
+    :return: list of (row, col) of every cell of the path
+    """
+    steps = {letter: step for step, letter in MOVES.items()}
+    row, col = start
+    path = [(row, col)]
+    for count, letter in re.findall(r"(\d*)([UDLR])", moves):
+        rowStep, colStep = steps[letter]
+        for _ in range(int(count or 1)):
+            row, col = row + rowStep, col + colStep
+            path.append((row, col))
+    return path
+
+def exportRoute(maze, path, folder, format="moves", name=ROUTE_NAME):
+    """
+    Writes the route of a path as JSON, without the rest of the maze: the start and end cell, the number of steps, the total
+    cost, and the cells in one of the ROUTE_FORMATS.
+    - "coords": "path", the (row, col) of every cell.
+    - "moves": "moves", one letter (U, D, L or R) per step from the start cell, see encodeMoves.
+    - "runs": "runs", the moves run-length encoded, see encodeRuns.
+    :param maze (Maze): The maze that was solved.
+    :param path (list): (row, col) of every cell of the path.
+    :param folder: The output folder.
+    :param format (str): One of ROUTE_FORMATS.
+    :param name: The name of the JSON file.
+    :return: str, the name written to folder
+    """
+    route = routeOf(maze, path, format)
+    with open(join(folder, name), "w") as file:
+        json.dump(route, file)
+    return name
+
+def routeOf(maze, path, format="moves"):
+    """
+    The route of a path, see exportRoute.
+    :return: dict with "start", "end", "steps", "cost" and the cells in the chosen format
+    """
+    if format not in ROUTE_FORMATS:
+        raise ValueError("Unknown route format " + format + ", expected one of " + ", ".join(ROUTE_FORMATS) + ".")
+    route = {"start": list(path[0]), "end": list(path[-1]), "steps": len(path) - 1, "cost": pathCost(maze, path)}
+    if format == "coords":
+        route["path"] = [list(point) for point in path]
+    else:
+        moves = encodeMoves(path)
+        route[format] = moves if format == "moves" else encodeRuns(moves)
+    return route
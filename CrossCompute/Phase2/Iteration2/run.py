@@ -1,182 +1,221 @@
+import os
 from os import getenv
-from pathlib import Path
 import csv
 from sys import argv
 from os.path import join
-import networkx as nx
-import matplotlib.pyplot as plt
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
+from os.path import exists
+from metrics import stage, record, startMetrics, stopMetrics, writeMetrics, PROFILE_NAME
+# NumPy, the solver, networkx, matplotlib and the renderer (Pillow) are imported inside the functions that use them,
+# so runs that do not need them (such as cache hits) do not pay for them at startup
 
-input_folder, output_folder = argv[1:]
+STARTUP_BUDGET_MS = 250 # --profile-startup flags startups that spend longer than this importing modules
+OPTION_CHOICES = { # The values an option can have, see checkOptions
+    "solver": ("networkx", "grid", "jps", "bidirectional", "hpa"),
+    "walls": ("weighted", "impassable"),
+    "query": ("single", "each", "nearest"),
+    "tiles": ("off", "on", "auto"),
+    "saveMaze": ("off", "binary", "csv"),
+    "saveGraph": ("off", "snapshot", "edgelist"),
+    "route": ("off", "coords", "moves", "runs"), # "off" or one of route.ROUTE_FORMATS, which is not imported here to keep startup fast
+}
 
 ###
 
-def csvToList(f):
+def validateMaze(maze, query="single", goals=None, summary=None):
     """
-    Converts CSV file into 2D list format.
-    :param f (str): The CSV to be converted.
-    :return: 2D list
+    Validates if a Maze is solvable by checking if the following rules are passed:
+    - There must be a start and end point.
+    - There can be no more than one start point, unless the nearest end point from any start point is asked for (query "nearest").
+    - There can be no more than one end point, unless a path to each end point or the nearest one is asked for (query "each" or "nearest").
+    - Every row must have the same number of cells.
+    - Every goal from a goal list must be inside the maze.
+    Errors about start, end and goal points list where they are.
+    :param maze (Maze): The maze to be validated.
+    :param query (str): "single" for one start and end point, "each" for a path from the start point to every goal,
+    "nearest" for the cheapest path from any start point to any end point. Default is "single".
+    :param goals (list): Optional ((row, col), name) of every goal from a goal list, which are used instead of the end points.
+    :param summary (MazeSummary): The analysis of the maze, see analysis.analyzeMaze. Default is to analyze it here.
+    :return: validation (bool), errors (str)
     """
-    with open(f.name, 'r') as file:
-        csvData = list(csv.reader(file))
-        rowNum = len(csvData)
-        colNum = len(csvData[0])
-        mazeList = [[0 for i in range(colNum)] for j in range(rowNum)]
-        for i in range(rowNum):
-            colNum = len(csvData[i])
-            for j in range(colNum):
-                mazeList[i][j] = csvData[i][j]
-    return mazeList
+    if summary is None:
+        from analysis import analyzeMaze
+        summary = analyzeMaze(maze)
+    errors = summary.validationErrors(query, goals)
+    return not errors, "".join(message + "\n" for message, points in errors)
 
-def validateMaze(mazeList):
+def checkOptions(**options):
     """
-    Validates if a 2D list is a maze by checking if the following rules are passed:
-    - There must be a start and end point.
-    - There can be no more than one start point.
-    - There can be no more than one end point.
-    :param mazeList: The 2D list to be validated.
-    :return: validation (bool), errors (str)
+    Checks the options of a run before any work is done, so a mistyped value fails at once instead of quietly running
+    something else.
+    :param options: Keyword arguments for solveMazeFile, or walls for the value of UNAVMAZE_WALLS. Options without a fixed set
+    of values in OPTION_CHOICES are not checked.
+    :raise ValueError: for a value that is not one of its OPTION_CHOICES
+    """
+    for name, value in options.items():
+        choices = OPTION_CHOICES.get(name)
+        if choices is not None and value not in choices:
+            raise ValueError("Unknown " + name + " " + str(value) + ", expected one of " + ", ".join(choices) + ".")
+
+def displayMaze(maze, pathMask=None):
+    """
+    Print out a Maze.
+    :param maze (Maze): The maze to be printed.
+    :param pathMask: Optional boolean grid of path cells.
+    """
+    for row in maze.toRows(pathMask):
+        print(" ".join(entry if entry != "" else " " for entry in row))
+
+def writeMaze(maze, folder, fileName="maze.txt", pathMask=None):
     """
-    validation = True
-    errors = ""
-    startCount = 0
-    endCount = 0
-    for i in range(len(mazeList)):
-        for j in range(len(mazeList[0])):
-            if mazeList[i][j] == "S":
-                startCount += 1
-            elif mazeList[i][j] == "E":
-                endCount += 1
-    if startCount == 0 or endCount == 0:
-        validation = False
-        errors += "There must be a start and end point.\n"
-    if startCount > 1:
-        validation = False
-        errors += "There can be no more than one start point.\n"
-    if endCount > 1:
-        validation = False
-        errors += "There can be no more than one end point.\n"
-    return validation, errors
-
-def displayMaze(mazeList):
-    """
-    Print out a 2D list in the format of a Maze.
-    :param mazeList: The 2D list to be printed.
-    """
-    row = ""
-    for i in range(len(mazeList)):
-        for j in range(len(mazeList[0])):
-            if row != "":
-                row += " "
-            if mazeList[i][j] == "":
-                row += " "
-            else:
-                row += str(mazeList[i][j])
-        print(row)
-        row = ""
-
-def writeMaze(mazeList, fileName="maze.txt"):
-    """
-    Write out a 2D list in the format in a txt file.
+    Write out a Maze in a txt file.
+    :param maze (Maze): The maze to be written.
+    :param folder: The output folder.
     :param fileName: The name of the file.
+    :param pathMask: Optional boolean grid of path cells.
     """
-    completeName = join(output_folder, fileName)
-    mazeFile = open(completeName,"a")
-    for i in range(len(mazeList)):
-        row = ""
-        for j in range(len(mazeList[0])):
-            if row != "":
-                row += " "
-            if mazeList[i][j] == "":
-                row += " "
-            else:
-                row += str(mazeList[i][j])
-        mazeFile.write(row + "\n")
-     
-def addWeightedEdges(G, mazeList, currentEntry, nextEntry):
-    nextEntryValue = mazeList[nextEntry[0]][nextEntry[1]]
-    if nextEntryValue == "W":
-        G.add_weighted_edges_from([(currentEntry,nextEntry,999999)],weight="weight")
-    elif nextEntryValue.isnumeric():
-        G.add_weighted_edges_from([(currentEntry,nextEntry,int(nextEntryValue))],weight="weight")
-    else:
-        G.add_weighted_edges_from([(currentEntry,nextEntry,1)],weight="weight")
-        
-def listToNetworkXGraph(mazeList, display=False):
+    completeName = join(folder, fileName)
+    with open(completeName,"a") as mazeFile:
+        for row in maze.toRows(pathMask):
+            mazeFile.write(" ".join(entry if entry != "" else " " for entry in row) + "\n")
+
+def addWeightedEdges(G, weights, currentEntry, nextEntry, walls=None):
+    if walls is not None and walls[nextEntry[0]][nextEntry[1]]: # walls get no incoming edges when they are impassable
+        return
+    G.add_weighted_edges_from([(currentEntry,nextEntry,weights[nextEntry[0]][nextEntry[1]])],weight="weight")
+
+def listToNetworkXGraph(maze, display=False, pruneWalls=False, folder=".", saveGraph="off"):
     """
-    Converts a list to a weighted NetworkX graph.
-    :param mazeList (list): The 2D list to be referenced
+    Converts a Maze to a weighted NetworkX graph.
+    :param maze (Maze): The maze to be referenced
     :param display (bool): Whether to display the graph. Default is False.
+    :param pruneWalls (bool): Whether edges into walls are left out instead of costing WALL_WEIGHT. Default is False.
+    :param folder: The output folder for mazeGraph.png when the graph is displayed, and for the saved graph.
+    :param saveGraph (str): "snapshot" reloads the binary graph snapshot mazeGraph.npz from folder, or builds the graph and writes it,
+    "edgelist" writes the graph as text to weighted.edgelist in folder, "off" saves nothing. Default is "off".
     :return: graph
     """
-    G = nx.MultiDiGraph()
-    for row in range(len(mazeList)):
-        for col in range(len(mazeList[0])):
-            G.add_node((row,col))
-            if row != 0: # If we are not in the first row, then we can connect edge to top of current row
-                addWeightedEdges(G, mazeList, (row,col), (row-1,col))
-            if col != 0: # If we are not in the first col, then we can connect edge to left of current col
-                addWeightedEdges(G, mazeList, (row,col), (row,col-1))
-            if row != len(mazeList)-1: # If we are not in the last row, then we can connect edge to bottom of current row
-                addWeightedEdges(G, mazeList, (row,col), (row+1,col))
-            if col != len(mazeList[0])-1: # If we are not in the last col, then we can connect edge to right of current col
-                addWeightedEdges(G, mazeList, (row,col), (row,col+1))
-    nx.write_weighted_edgelist(G, "weighted.edgelist")
+    import networkx as nx
+    from maze import EMPTY, WALL, START, END, WEIGHTED
+    rowNum, colNum = maze.shape
+    if saveGraph == "snapshot":
+        from graph import loadSnapshot
+        G = loadSnapshot(folder, maze, pruneWalls).toNetworkX()
+    else:
+        weights = maze.weights.tolist()
+        walls = maze.walls.tolist() if pruneWalls else None
+        G = nx.MultiDiGraph()
+        for row in range(rowNum):
+            for col in range(colNum):
+                G.add_node((row,col))
+                if row != 0: # If we are not in the first row, then we can connect edge to top of current row
+                    addWeightedEdges(G, weights, (row,col), (row-1,col), walls)
+                if col != 0: # If we are not in the first col, then we can connect edge to left of current col
+                    addWeightedEdges(G, weights, (row,col), (row,col-1), walls)
+                if row != rowNum-1: # If we are not in the last row, then we can connect edge to bottom of current row
+                    addWeightedEdges(G, weights, (row,col), (row+1,col), walls)
+                if col != colNum-1: # If we are not in the last col, then we can connect edge to right of current col
+                    addWeightedEdges(G, weights, (row,col), (row,col+1), walls)
+    if saveGraph == "edgelist":
+        from graph import EDGELIST_NAME
+        nx.write_weighted_edgelist(G, join(folder, EDGELIST_NAME))
     if display==True:
+        import matplotlib.pyplot as plt
         colorMap = []
         labels = dict()
         pos = dict()
-        count = 0
-        for i in range(len(mazeList)):
-            for j in range(len(mazeList[0])):
-                pos[i,j] = j,len(mazeList)-i
-                labels[i,j] = mazeList[i][j]
-                if mazeList[i][j] == "W":
-                    colorMap.append("black")
-                elif mazeList[i][j] == "S":
-                    colorMap.append("green")
-                elif mazeList[i][j] == "E":
-                    colorMap.append("red")
-                elif mazeList[i][j].isnumeric():
-                    colorMap.append("brown")
-                else:
-                    colorMap.append("white")
+        kindColors = {EMPTY: "white", WALL: "black", START: "green", END: "red", WEIGHTED: "brown"}
+        for i in range(rowNum):
+            for j in range(colNum):
+                pos[i,j] = j,rowNum-i
+                labels[i,j] = maze.cellText(i,j)
+                colorMap.append(kindColors[maze.kinds[i,j]])
         nx.draw_networkx(G,pos, node_color=colorMap, labels=labels, font_size=6)
         # nx.draw_networkx(G,pos, node_color=colorMap, with_labels=False, font_size=6)
         plt.axis("off")
-        completeName = join(output_folder, "mazeGraph.png")
+        completeName = join(folder, "mazeGraph.png")
         plt.savefig(completeName, format="PNG")
     return G
 
+def graphArtifacts(saveGraph):
+    """
+    The files listToNetworkXGraph saves the graph to.
+    :param saveGraph (str): "snapshot", "edgelist" or "off".
+    :return: list of names in the output folder
+    """
+    from graph import SNAPSHOT_NAME, EDGELIST_NAME
+    return {"snapshot": [SNAPSHOT_NAME], "edgelist": [EDGELIST_NAME]}.get(saveGraph, [])
+
 def calculatePath(G, startPoint, endPoint):
-    return nx.astar_path(G, startPoint, endPoint, weight="weight")
+    """
+    Finds the shortest path through a NetworkX graph of a maze.
+    :return: list of (row, col), or None if the end point can not be reached
+    """
+    import networkx as nx
+    try:
+        return nx.astar_path(G, startPoint, endPoint, weight="weight")
+    except nx.NetworkXNoPath:
+        return None
 
-def locateStartAndEnd(mazeList):
-    startPoint = (0,0)
-    endPoint = (0,0)
-    for i in range(len(mazeList)):
-        for j in range(len(mazeList[0])):
-            if mazeList[i][j] == "S":
-                startPoint = i,j
-            elif mazeList[i][j] == "E":
-                endPoint = i,j
-    return startPoint, endPoint
+def calculatePaths(G, startPoint, goals):
+    """
+    Finds the shortest path through a NetworkX graph of a maze from the start point to every goal with one search.
+    :return: list with a list of (row, col), or None if the goal can not be reached, for every goal
+    """
+    import networkx as nx
+    costs, paths = nx.single_source_dijkstra(G, startPoint, weight="weight")
+    return [paths.get(tuple(goal)) for goal in goals]
 
-def mazeSolution(data, path):
+def calculateNearestPath(G, starts, ends):
     """
-    Given a path, input the solution into a given list.
-    :param data (list): The list being referenced.
-    :param path (list): The path that will be added to the list.
+    Finds the cheapest path through a NetworkX graph of a maze from any start point to any end point with one search.
+    Every end point is joined to a temporary exit node for free, so the search can stop at whichever is reached first.
+    :return: list of (row, col), or None if no end point can be reached
     """
-    for i in range(1,len(path)-1):
-        data[path[i][0]][path[i][1]] += "P"
+    import networkx as nx
+    exitNode = "exit"
+    G.add_weighted_edges_from((tuple(end), exitNode, 0) for end in ends)
+    try:
+        return nx.multi_source_dijkstra(G, {tuple(start) for start in starts}, target=exitNode, weight="weight")[1][:-1]
+    except nx.NetworkXNoPath:
+        return None
+    finally:
+        G.remove_node(exitNode)
+
+def locateStartAndEnd(maze):
+    return maze.start, maze.end
+
+def mazeSolution(maze, path):
+    """
+    Given a path, mark the cells between the start and end point as path cells.
+    :param maze (Maze): The maze being referenced.
+    :param path (list): The path that will be marked.
+    :return: boolean grid of path cells
+    """
+    import numpy as np
+    pathMask = np.zeros(maze.shape, dtype=bool)
+    if len(path) > 2:
+        rows, cols = zip(*path[1:-1])
+        pathMask[rows, cols] = True
+    return pathMask
+
+def mazeSolutions(maze, paths):
+    """
+    Given several paths, mark every cell they pass through as a path cell. Start and end points are never marked.
+    :param maze (Maze): The maze being referenced.
+    :param paths (list): The paths that will be marked.
+    :return: boolean grid of path cells
+    """
+    from maze import START, END
+    pathMask = mazeSolution(maze, [])
+    for path in paths:
+        pathMask |= mazeSolution(maze, path)
+    pathMask &= (maze.kinds != START) & (maze.kinds != END)
+    return pathMask
 
 def exportCSV(data, folder, name):
     """
     Export a csv file given data for contents of the maze
-    :param data (list): The list containing information about the maze.
+    :param data: The rows containing information about the maze, such as Maze.toRows(pathMask).
     :param folder: The output folder.
     :param name: The name of the CSV file.
     """
@@ -185,119 +224,409 @@ def exportCSV(data, folder, name):
         csvWriter = csv.writer(pathcsv,delimiter=',')
         csvWriter.writerows(data)
 
-def getMinAndMax(data):
-    """
-    Gets the minimum and maximum weight values from a maze.
-    :param data: The 2D list to get the information from.
-    """
-    min = 999999999
-    max = 0
-    for i in range(len(data)):
-        for v in range(len(data[0])):
-            entry = data[i][v]
-            if entry.isnumeric():
-                if int(entry) > 1:
-                    if int(entry) < min:
-                        min = int(entry)
-                    if int(entry) > max:
-                        max = int(entry)
-    if min > max: # If we still have the sentinal value of 999999999 for min, we return 0
-        min = 0
-    return min,max
-        
-def putPixel(img, row, col, color, scale):
-    """
-    Color a square of pixels with a given color.
-    :param img: The image to be colored.
-    :param row: Row value.
-    :param col: Col value.
-    :param color (3-tuple): An rgb color value. 
-    """
-    for j in range(scale):
-        for k in range(scale):
-            xPos = (row*scale)+(j)
-            yPos = (col*scale)+(k)
-            if j == 0 or k == 0 or j == scale-1 or k == scale-1: # check to see if we are at an outline pixel
-                if color == (255,255,255): # if white, we color outline with gray instead (empty cells)
-                    img.putpixel((xPos,yPos), (225,225,225))
-                else: # color darker shade of color to discern the outline
-                    img.putpixel((xPos,yPos), (int(color[0]*.85),int(color[1]*.85),int(color[2]*.85)))
-            else: # if we are not on at an outline pixel, color with normal color
-                img.putpixel((xPos,yPos), color)
-
-def labelWeights(img, data, scale):
-    I1 = ImageDraw.Draw(img)
-    try:
-        font = ImageFont.truetype("arial.ttf",scale*.75)
-    except OSError:
-        font = ImageFont.truetype("NotoSans[wght].ttf", scale * .75) 
-    for i in range(len(data)):
-        for v in range(len(data[0])):
-            entry = data[i][v]
-            if len(entry) > 1:
-                if entry[-1] == "P":
-                    entry = entry[:-1] # remove the last character (P) so we can label only the numerical weight
-                I1.text((v*scale+scale*.25,i*scale+scale*.1),entry,font=font,fill=(0,0,0))
-            elif entry.isnumeric():
-                if int(entry) > 1:
-                    I1.text((v*scale+scale*.25,i*scale+scale*.1),entry,font=font,fill=(0,0,0))
-            elif entry.lower() == "s":
-                I1.text((v*scale+scale*.25,i*scale+scale*.1),entry,font=font,fill=(0,0,0))
-            elif entry.lower() == "e":
-                I1.text((v*scale+scale*.25,i*scale+scale*.1),entry,font=font,fill=(0,0,0))
-
-def createImage(data, scale):
+def createImage(maze, pathMask, scale, folder, minAndMax=None):
     """
     Create a image of the maze using the PIL library.
-    :param data: The 2D list with path to create an image from.
-    """
-    width = len(data[0])*scale
-    height = len(data)*scale
-    img  = Image.new(mode = "RGB", size = (width, height), color=(255,255,255))
-    min,max = getMinAndMax(data)
-    for i in range(len(data)):
-        for v in range(len(data[0])):
-            if len(data[i][v]) > 0:
-                if data[i][v].isnumeric():
-                    if int(data[i][v]) > 1:
-                        red = 50+(255-(255 * (int(data[i][v])-min) // (max-min))) # scale red from 0 - 255 based on min and max values | add 50 to the scaled value to ensure lightest brown instead of black if value is 0
-                        green = red // 2 # green is red / 2 to make brown
-                        blue = green // 2 # blue is green / 2 to make brown
-                        putPixel(img, v, i, (red,green,blue), scale)
-                if data[i][v].lower() == "w": # if wall, color black
-                    putPixel(img, v, i, (0,0,0), scale)
-                if (data[i][v].lower())[-1] == "p": # if weight concatenated with path, color blue
-                    putPixel(img, v, i, (137, 207, 240), scale)
-                if data[i][v].lower() == "s": # if start, color green
-                    putPixel(img, v, i, (0,255,0), scale)
-                if data[i][v].lower() == "e": # if end, color red
-                    putPixel(img, v, i, (255,0,0), scale)
-            else:
-                putPixel(img, v, i, (255,255,255), scale)
-
-    labelWeights(img, data, scale)
-    completeName = join(output_folder, "mazeImage.png")
-    img.save(completeName)
-    
-def determineScale(data):
-    mazeMin,mazeMax = getMinAndMax(data)
-    maxScale = 50
-    scale = maxScale - (maxScale * (mazeMax//maxScale))
-    return scale
+    :param maze (Maze): The maze to create an image from.
+    :param pathMask: Boolean grid of path cells.
+    :param scale: The width and height of each cell in pixels.
+    :param folder: The output folder.
+    :param minAndMax: The (min, max) weights to color with, see render.cellColors.
+    """
+    from render import renderImage, labelWeights
+    with stage("render"):
+        img = renderImage(maze, pathMask, scale, minAndMax)
+    with stage("label"):
+        labelWeights(img, maze, pathMask, scale)
+    completeName = join(folder, "mazeImage.png")
+    with stage("save"):
+        img.save(completeName)
+
+def drawSolution(maze, pathMask, folder, tiles="off", summary=None):
+    """
+    Draws a solved maze at the scale from determineScale, as one mazeImage.png or as a tiled pyramid (see tiles.py).
+    :param maze (Maze): The solved maze.
+    :param pathMask: Boolean grid of path cells.
+    :param folder: The output folder.
+    :param tiles (str): "on" always writes the pyramid, "auto" only when the image would have more than tiles.PIXEL_BUDGET pixels,
+    "off" never does. Default is "off".
+    :param summary (MazeSummary): The analysis of the maze, whose weight range is reused instead of scanning the maze again.
+    :return: list of the names written to folder
+    """
+    from render import determineScale, getMinAndMax
+    minAndMax = summary.minAndMax(maze, pathMask) if summary is not None else getMinAndMax(maze, pathMask)
+    scale = determineScale(maze, pathMask, minAndMax)
+    if tiles != "off":
+        from tiles import writePyramid, PIXEL_BUDGET
+        if tiles == "on" or maze.rows * maze.cols * scale * scale > PIXEL_BUDGET:
+            with stage("tiles"):
+                return writePyramid(maze, pathMask, scale, folder, minAndMax=minAndMax)
+    createImage(maze, pathMask, scale, folder, minAndMax)
+    return ["mazeImage.png"]
+
+def findMazeFile(input_folder):
+    """
+    Finds the maze in an input folder, preferring data.csv over data.csv.gz over the binary data.maze.
+    :param input_folder: The folder to look in.
+    :return: str, path of the maze file
+    """
+    for name in ("data.csv", "data.csv.gz", "data.maze"):
+        if exists(join(input_folder, name)):
+            return join(input_folder, name)
+    return join(input_folder, "data.csv")
+
+def findGoalsFile(completeName):
+    """
+    Finds the goal list (goals.csv) that sits next to a data.csv, data.csv.gz or data.maze.
+    :param completeName: The maze file.
+    :return: str, path of the goal list, or None if there is none
+    """
+    if not os.path.basename(completeName).startswith(("data.csv", "data.maze")):
+        return None
+    goalsName = join(os.path.dirname(completeName), "goals.csv")
+    return goalsName if exists(goalsName) else None
+
+def exportGoalPaths(maze, goals, results, folder, name="goalPaths.json"):
+    """
+    Export the path and cost to every goal as JSON.
+    :param maze (Maze): The maze that was solved.
+    :param goals (list): ((row, col), name) of every goal.
+    :param results (list): The SearchResult of every goal.
+    :param folder: The output folder.
+    :param name: The name of the JSON file.
+    """
+    import json
+    entries = []
+    for (goal, goalName), result in zip(goals, results):
+        entries.append({"name": goalName, "goal": list(goal), "cost": result.cost,
+                        "path": [list(point) for point in result.path] if result.found else None})
+    with open(join(folder, name), "w") as file:
+        json.dump({"start": list(maze.start), "goals": entries}, file)
+
+def solveGoals(maze, output_folder, solver="networkx", pruneWalls=False, goals=None, tiles="off", saveGraph="off", summary=None):
+    """
+    Solves the paths from the start point to each goal with a single search, then writes mazeImage.png and goalPaths.json.
+    :param maze (Maze): A validated maze.
+    :param output_folder: Folder the outputs are written to.
+    :param solver (str): "grid" for the built-in A* engine, "networkx" for nx.single_source_dijkstra. Other solvers use the built-in A* engine, which searches for every goal at once.
+    :param pruneWalls (bool): Whether walls are left out of the search entirely.
+    :param goals (list): ((row, col), name) of every goal. Default is every end point of the maze.
+    :param tiles (str): Whether the image is also written as tiles, see drawSolution.
+    :param saveGraph (str): Whether the NetworkX graph is saved to output_folder, see listToNetworkXGraph.
+    :param summary (MazeSummary): The analysis of the maze, see drawSolution.
+    :return: result (dict), see runPipeline
+    """
+    from solver import SearchResult, noPath, gridAStarGoals
+    mode = searchMode(solver, "each")
+    if goals is None:
+        goals = [(end, maze.endName(end)) for end in maze.ends]
+    points = [goal for goal, name in goals]
+    graphFiles = [] # the saved graph, which only the NetworkX solver builds
+    if mode == "networkx":
+        with stage("graph"):
+            G = listToNetworkXGraph(maze, display=False, pruneWalls=pruneWalls, folder=output_folder, saveGraph=saveGraph)
+        graphFiles = graphArtifacts(saveGraph)
+        results = []
+        with stage("search"):
+            for path in calculatePaths(G, maze.start, points):
+                results.append(SearchResult(path, sum(int(maze.weights[point]) for point in path[1:]), None) if path is not None else noPath(None))
+    else:
+        with stage("search"):
+            results = gridAStarGoals(maze, maze.start, points, pruneWalls=pruneWalls)
+        record(frontierPeak=results[0].frontier)
+    expanded = max(result.expanded for result in results) if mode != "networkx" else None # goals settle during the same search
+    message = ""
+    for (goal, name), result in zip(goals, results):
+        if not result.found:
+            message += "There is no path from the start point to " + name + ".\n"
+    if not any(result.found for result in results):
+        return {"solved": False, "message": message, "path": None, "artifacts": graphFiles, "mode": mode, "expanded": expanded}
+    with stage("solution"):
+        pathMask = mazeSolutions(maze, [result.path for result in results if result.found])
+    artifacts = drawSolution(maze, pathMask, output_folder, tiles, summary)
+    with stage("export"):
+        exportGoalPaths(maze, goals, results, output_folder)
+    return {"solved": True, "message": message, "path": None, "artifacts": artifacts + ["goalPaths.json"] + graphFiles, "mode": mode, "expanded": expanded}
+
+def searchMode(solver, query="single"):
+    """
+    The search that solves a query: the NetworkX solver handles every query, while Jump Point Search, bidirectional
+    search and HPA* only find a single path, so other queries use the grid engine instead.
+    :param solver (str): The solver that was asked for.
+    :param query (str): The query being solved.
+    :return: str, "grid", "jps", "bidirectional", "hpa" or "networkx"
+    """
+    checkOptions(solver=solver)
+    if solver in ("networkx", "grid") or (solver in ("jps", "bidirectional", "hpa") and query == "single"):
+        return solver
+    return "grid"
+
+def runPipeline(completeName, output_folder, solver="networkx", pruneWalls=False, query="single", goalsFile=None, tiles="off", saveMaze="off", saveGraph="off", route="off"):
+    """
+    Parses, validates and solves a maze file, then writes mazeImage.png to output_folder.
+    :param completeName: The maze file, CSV or binary (.maze).
+    :param output_folder: Folder the image is written to.
+    :param solver (str): "grid" for the built-in A* engine, "jps" for Jump Point Search, "bidirectional" for bidirectional A*, "hpa" for HPA*, "networkx" for nx.astar_path.
+    :param pruneWalls (bool): Whether walls are left out of the search entirely.
+    :param query (str): "single" for one start and end point, "each" for a path from the start point to every goal,
+    "nearest" for the cheapest path from any start point to any end point.
+    :param goalsFile: Optional goal list to use instead of the end points when query is "each", see maze.readGoals.
+    :param tiles (str): "on" or "auto" to also write the image as a Deep Zoom pyramid of tiles, see drawSolution.
+    :param saveMaze (str): "binary" to also write the maze to output_folder as data.maze, "csv" as data.csv, "off" not at all.
+    :param saveGraph (str): "snapshot" or "edgelist" to save the NetworkX graph to output_folder, see listToNetworkXGraph.
+    :param route (str): "coords", "moves" or "runs" to also write the path and its cost to mazePath.json, see route.exportRoute, "off" not at all.
+    :return: result (dict) with "solved", "message", "path", the "artifacts" written to output_folder, the search "mode"
+    that was used and the number of cells it "expanded" (None for NetworkX). HPA* also reports the "abstractNodes" it
+    expanded before refining the route through the cells.
+    """
+    from maze import readMaze, readGoals
+    with stage("parse"):
+        maze = readMaze(completeName)
+        goals = readGoals(goalsFile) if goalsFile and query == "each" else None
+    record(rows=maze.rows, cols=maze.cols)
+    result = solveParsedMaze(maze, completeName, output_folder, solver, pruneWalls, query, goals, tiles, saveGraph, route)
+    if saveMaze != "off":
+        with stage("saveMaze"):
+            result["artifacts"].append(writeMazeFile(maze, output_folder, saveMaze))
+    return result
+
+def writeMazeFile(maze, folder, format="binary"):
+    """
+    Writes the parsed maze, so later runs can load data.maze without parsing the CSV.
+    :param maze (Maze): The maze to write.
+    :param folder: The output folder.
+    :param format (str): "binary" for data.maze, "csv" for data.csv.
+    :return: str, the name of the file written to folder
+    """
+    from maze import writeMazeBinary, writeMazeCSV
+    if format == "csv":
+        writeMazeCSV(maze, join(folder, "data.csv"))
+        return "data.csv"
+    writeMazeBinary(maze, join(folder, "data.maze"))
+    return "data.maze"
+
+def findPath(maze, completeName, output_folder, mode, query="single", pruneWalls=False, saveGraph="off"):
+    """
+    Searches a validated maze for the path of a "single" or "nearest" query, timing the graph or index build and the search.
+    :param maze (Maze): A validated maze.
+    :param completeName: The maze file, which the HPA* index is saved next to.
+    :param output_folder: Folder the NetworkX graph is saved to, see listToNetworkXGraph.
+    :param mode (str): The search to use, from searchMode.
+    :param query (str): "single" or "nearest".
+    :param pruneWalls (bool): Whether walls are left out of the search entirely.
+    :param saveGraph (str): Whether the NetworkX graph is saved, see listToNetworkXGraph.
+    :return: path (list of (row, col), or None if there is none), search (SearchResult of the built-in engines, None for NetworkX)
+    """
+    startPoint, endPoint = locateStartAndEnd(maze)
+    search = None
+    if mode == "networkx":
+        with stage("graph"):
+            G = listToNetworkXGraph(maze, display=False, pruneWalls=pruneWalls, folder=output_folder, saveGraph=saveGraph)
+    elif mode == "hpa":
+        from hierarchy import loadIndex
+        with stage("index"):
+            index = loadIndex(completeName, maze)
+    with stage("search"):
+        if mode == "networkx":
+            return (calculateNearestPath(G, maze.starts, maze.ends) if query == "nearest" else calculatePath(G, startPoint, endPoint)), None
+        elif query == "nearest":
+            from solver import gridAStarNearest
+            search = gridAStarNearest(maze, maze.starts, maze.ends, pruneWalls=pruneWalls)
+        elif mode == "jps":
+            from solver import jumpPointSearch
+            search = jumpPointSearch(maze, startPoint, endPoint, pruneWalls=pruneWalls)
+        elif mode == "bidirectional":
+            from solver import bidirectionalSearch
+            search = bidirectionalSearch(maze, startPoint, endPoint, pruneWalls=pruneWalls)
+        elif mode == "hpa":
+            search = index.query(startPoint, endPoint, pruneWalls=pruneWalls)
+        else:
+            from solver import gridAStar
+            search = gridAStar(maze, startPoint, endPoint, pruneWalls=pruneWalls)
+    record(frontierPeak=search.frontier)
+    if search.abstractNodes is not None:
+        record(abstractNodes=search.abstractNodes)
+    return search.path, search
+
+def noPathMessage(query="single"):
+    noun = "any start point to any end point" if query == "nearest" else "the start point to the end point"
+    return "There is no path from " + noun + ".\n"
+
+def solveParsedMaze(maze, completeName, output_folder, solver="networkx", pruneWalls=False, query="single", goals=None, tiles="off", saveGraph="off", route="off"):
+    """
+    Validates and solves a parsed maze, then writes mazeImage.png to output_folder.
+    :param maze (Maze): The maze read from completeName.
+    :param completeName: The maze file, which the HPA* index is saved next to.
+    :param goals (list): Optional ((row, col), name) of every goal from a goal list.
+    The other parameters and the result are the same as runPipeline.
+    """
+    from analysis import analyzeMaze
+    with stage("analyze"):
+        summary = analyzeMaze(maze)
+    with stage("validate"):
+        validation = validateMaze(maze, query, goals, summary)
+    if not validation[0]:
+        return {"solved": False, "message": validation[1], "path": None, "artifacts": [], "mode": None, "expanded": None}
+    # writeMaze(maze, output_folder)
+    if query == "each":
+        return solveGoals(maze, output_folder, solver, pruneWalls, goals, tiles, saveGraph, summary)
+    mode = searchMode(solver, query)
+    shortestPath, search = findPath(maze, completeName, output_folder, mode, query, pruneWalls, saveGraph)
+    graphFiles = graphArtifacts(saveGraph) if mode == "networkx" else [] # the saved graph, which only the NetworkX solver builds
+    expanded = search.expanded if search is not None else None
+    abstractNodes = search.abstractNodes if search is not None else None
+    if shortestPath is None:
+        return {"solved": False, "message": noPathMessage(query), "path": None, "artifacts": graphFiles, "mode": mode, "expanded": expanded,
+                "abstractNodes": abstractNodes}
+    routeFiles = []
+    if route != "off": # the route alone, for consumers that do not need the maze around it
+        from route import exportRoute
+        with stage("route"):
+            routeFiles.append(exportRoute(maze, shortestPath, output_folder, route))
+    with stage("solution"):
+        pathMask = mazeSolution(maze, shortestPath)
+    artifacts = drawSolution(maze, pathMask, output_folder, tiles, summary)
+    return {"solved": True, "message": "", "path": [list(point) for point in shortestPath], "artifacts": artifacts + routeFiles + graphFiles, "mode": mode, "expanded": expanded,
+            "abstractNodes": abstractNodes}
+
+def solveMazeFile(completeName, output_folder, solver="networkx", pruneWalls=False, cacheFolder=None, query="single", tiles="off", saveMaze="off", saveGraph="off", route="off"):
+    """
+    Solves a maze file and writes mazeImage.png to output_folder, going through the cache when one is given.
+    A goals.csv next to a data.csv is used as the goal list.
+    How long each stage took, the peak memory and the search counters are written to metrics.json in output_folder.
+    With UNAVMAZE_PROFILE=on, a cProfile dump of the whole run is written to profile.prof as well.
+    :param completeName: The maze file (.csv, .csv.gz or .maze).
+    :param output_folder: Folder the image is written to.
+    :param solver (str): "grid" for the built-in A* engine, "jps" for Jump Point Search, "bidirectional" for bidirectional A*, "hpa" for HPA*, "networkx" for nx.astar_path. Default is "networkx".
+    :param pruneWalls (bool): Whether walls are left out of the search entirely. Default is False.
+    :param cacheFolder: Optional folder of previously solved mazes, see cache.py. Default is None (no cache).
+    :param query (str): "single" for one start and end point, "each" for a path from the start point to every goal,
+    "nearest" for the cheapest path from any start point to any end point. Default is "single".
+    :param tiles (str): "on" or "auto" to also write the image as a Deep Zoom pyramid of tiles, see drawSolution. Default is "off".
+    :param saveMaze (str): "binary" or "csv" to also write the maze to output_folder, see runPipeline. Default is "off".
+    :param saveGraph (str): "snapshot" or "edgelist" to save the NetworkX graph to output_folder, see listToNetworkXGraph. Default is "off".
+    :param route (str): "coords", "moves" or "runs" to also write the path and its cost to mazePath.json, see runPipeline. Default is "off".
+    :return: result (dict), see runPipeline
+    """
+    checkOptions(solver=solver, query=query, tiles=tiles, saveMaze=saveMaze, saveGraph=saveGraph, route=route)
+    metrics = startMetrics()
+    profiler = None
+    if getenv("UNAVMAZE_PROFILE", "off") == "on":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        goalsFile = findGoalsFile(completeName)
+        cached = False
+        if not cacheFolder:
+            result = runPipeline(completeName, output_folder, solver, pruneWalls, query, goalsFile, tiles, saveMaze, saveGraph, route)
+        else:
+            from cache import mazeKey, fetchCached, storeCached
+            with stage("cacheFetch"):
+                key = mazeKey(completeName, [goalsFile] if goalsFile and query == "each" else [], solver=solver, pruneWalls=pruneWalls, query=query, scale="auto", tiles=tiles, saveMaze=saveMaze, saveGraph=saveGraph, route=route)
+                result = fetchCached(cacheFolder, key, output_folder)
+            cached = result is not None
+            if result is None:
+                result = runPipeline(completeName, output_folder, solver, pruneWalls, query, goalsFile, tiles, saveMaze, saveGraph, route)
+                with stage("cacheStore"):
+                    storeCached(cacheFolder, key, output_folder, result, int(getenv("UNAVMAZE_CACHE_MB", "512")) * 1024 * 1024)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(join(output_folder, PROFILE_NAME))
+        stopMetrics()
+    summary = {"mazeFile": completeName, "solver": solver, "query": query, "cached": cached,
+               "solved": result["solved"], "mode": result["mode"], "expanded": result["expanded"], "abstractNodes": result.get("abstractNodes")}
+    metrics.values = {**summary, **metrics.values}
+    writeMetrics(metrics, output_folder)
+    return result
+
+def solveMaze(input_folder, output_folder, solver="networkx", pruneWalls=False, cacheFolder=None, query="single", tiles="off", saveMaze="off", saveGraph="off", route="off"):
+    """
+    Reads the maze in input_folder, solves it and writes mazeImage.png to output_folder.
+    Problems with the maze are printed instead.
+    :param input_folder: Folder containing data.csv, data.csv.gz or data.maze.
+    :param output_folder: Folder the image is written to.
+    :param solver (str): "grid" for the built-in A* engine, "jps" for Jump Point Search, "bidirectional" for bidirectional A*, "hpa" for HPA*, "networkx" for nx.astar_path. Default is "networkx".
+    :param pruneWalls (bool): Whether walls are left out of the search entirely. Default is False.
+    :param cacheFolder: Optional folder of previously solved mazes, see cache.py. Default is None (no cache).
+    :param query (str): "single" for one start and end point, "each" for a path from the start point to every goal,
+    "nearest" for the cheapest path from any start point to any end point. Default is "single".
+    :param tiles (str): "on" or "auto" to also write the image as a Deep Zoom pyramid of tiles, see drawSolution. Default is "off".
+    :param saveMaze (str): "binary" or "csv" to also write the maze to output_folder, see runPipeline. Default is "off".
+    :param saveGraph (str): "snapshot" or "edgelist" to save the NetworkX graph to output_folder, see listToNetworkXGraph. Default is "off".
+    :param route (str): "coords", "moves" or "runs" to also write the path and its cost to mazePath.json, see runPipeline. Default is "off".
+    :return: bool, whether the maze was solved
+    """
+    result = solveMazeFile(findMazeFile(input_folder), output_folder, solver, pruneWalls, cacheFolder, query, tiles, saveMaze, saveGraph, route)
+    if result["message"]:
+        print(result["message"])
+    if result.get("abstractNodes") is not None: # HPA* searches the abstract graph before the cells
+        print("Searched with " + result["mode"] + ", expanding " + str(result["abstractNodes"]) + " abstract nodes and " + str(result["expanded"]) + " cells.")
+    elif result["expanded"] is not None: # NetworkX does not count the cells it expands
+        print("Searched with " + result["mode"] + ", expanding " + str(result["expanded"]) + " cells.")
+    return result["solved"]
+
+def optionsFromEnvironment():
+    """
+    Reads the solver options from environment variables.
+    :raise ValueError: for an unknown value, see checkOptions
+    :return: dict of keyword arguments for solveMaze
+    """
+    walls = getenv("UNAVMAZE_WALLS", "weighted")
+    checkOptions(walls=walls)
+    options = {
+        "solver": getenv("UNAVMAZE_SOLVER", "networkx"), # "networkx" for nx.astar_path, "grid" for the built-in A* engine, "jps" for Jump Point Search, "bidirectional" for bidirectional A*, "hpa" for HPA*
+        "pruneWalls": walls == "impassable", # "impassable" leaves walls out of the search entirely
+        "cacheFolder": getenv("UNAVMAZE_CACHE"), # folder to keep solved mazes in, unset to always solve
+        "query": getenv("UNAVMAZE_QUERY", "single"), # "each" solves a path from the start point to every end point or goal in goals.csv, "nearest" the cheapest path from any start point to any end point
+        "tiles": getenv("UNAVMAZE_TILES", "off"), # "on" also writes the image as Deep Zoom tiles (mazeImage.dzi), "auto" only when it is too big for one image
+        "saveMaze": getenv("UNAVMAZE_SAVE_MAZE", "off"), # "binary" also writes the maze as data.maze, which later runs load without parsing, "csv" as data.csv
+        "saveGraph": getenv("UNAVMAZE_GRAPH", "off"), # "snapshot" keeps the NetworkX graph in mazeGraph.npz for later runs to reload, "edgelist" dumps it as text to weighted.edgelist
+        "route": getenv("UNAVMAZE_ROUTE", "off"), # "coords", "moves" or "runs" also writes the path and its cost to mazePath.json in that form
+    }
+    checkOptions(**options)
+    return options
+
+def profileStartup(input_folder, output_folder, budget=STARTUP_BUDGET_MS):
+    """
+    Runs run.py again under python -X importtime and prints how long each top level module took to import.
+    :param input_folder: Folder containing data.csv or data.csv.gz.
+    :param output_folder: Folder the image is written to.
+    :param budget: Milliseconds that importing is allowed to take.
+    """
+    import subprocess
+    import sys
+    from time import perf_counter
+    startTime = perf_counter()
+    child = subprocess.run([sys.executable, "-X", "importtime", __file__, input_folder, output_folder], capture_output=True, text=True)
+    wallTime = (perf_counter() - startTime) * 1000
+    print(child.stdout, end="")
+    modules = []
+    for line in child.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            if line.strip():
+                print(line) # anything else the run printed to stderr
+            continue
+        selfTime, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   "): # indented names were imported by another module, which already counts them
+            continue
+        modules.append((int(cumulative) / 1000, name.strip()))
+    importTime = sum(ms for ms, name in modules)
+    modules.sort(reverse=True)
+    print("Startup profile (import time per top level module):")
+    for ms, name in modules:
+        if ms >= 1:
+            print("  " + format(ms, "8.1f") + " ms  " + name)
+    print("  " + format(importTime, "8.1f") + " ms  importing in total, " + format(wallTime, ".1f") + " ms for the whole run")
+    if importTime > budget:
+        print("Imports took longer than the startup budget of " + str(budget) + " ms.")
 
 ###
-completeName = join(input_folder, "data.csv")
-with open(completeName, 'r') as file:
-    data = csvToList(file)
-    validation = validateMaze(data)
-    if validation[0]:
-        # writeMaze(data)
-        G = listToNetworkXGraph(data, display=False)
-        startPoint, endPoint = locateStartAndEnd(data)
-        shortestPath = calculatePath(G, startPoint, endPoint)
-        mazeSolution(data, shortestPath)
-        scale = determineScale(data)
-        createImage(data, scale)
+if __name__ == "__main__":
+    options = [arg for arg in argv[1:] if arg.startswith("--")]
+    input_folder, output_folder = [arg for arg in argv[1:] if not arg.startswith("--")]
+    if "--profile-startup" in options:
+        profileStartup(input_folder, output_folder)
     else:
-        print(validation[1])
-        exit()
\ No newline at end of file
+        solveMaze(input_folder, output_folder, **optionsFromEnvironment())
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join
+from time import perf_counter
+from urllib.parse import parse_qs, urlsplit
+import run
+from maze import MAZE_MAGIC
+from parallel import startWorker
+
+QUEUE_SIZE = 64 # Requests waiting for a worker before new ones are turned away with 503
+TIMEOUT = 30 # Seconds a request may take by default before its worker is killed
+MEMORY_MB = 2048 # Address space each worker may use by default, 0 for no limit
+MAX_UPLOAD = 256 * 2**20 # Largest maze upload in bytes
+OUTPUTS = ("path", "image", "both")
+WARMUP_MAZE = "S,,2\nW,W,\nE,3,\n" # Solved once by every worker as it starts, so the first request finds everything loaded
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+###
+
+def uploadName(body):
+    """
+    Names an uploaded maze after its format, which is told by its first bytes: binary (.maze), gzipped CSV or CSV.
+    :param body (bytes): The uploaded maze file.
+    :return: str, data.maze, data.csv.gz or data.csv
+    """
+    if body.startswith(MAZE_MAGIC):
+        return "data.maze"
+    if body.startswith(b"\x1f\x8b"):
+        return "data.csv.gz"
+    return "data.csv"
+
+def limitMemory(memoryMB):
+    """
+    Limits the address space of this process, so a maze too big for the limit fails with MemoryError instead of
+    taking memory from the rest of the machine. Does nothing where resource is not available (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    if memoryMB:
+        limit = memoryMB * 2**20
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def serviceWorker(connection, options, memoryMB):
+    """
+    Solves uploaded mazes sent over a pipe until it receives None, in a scratch folder of its own.
+    Every maze goes through run.solveMazeFile, the same as run.py, so the path and image are the same.
+    :param connection: This worker's end of the pipe.
+    :param options (dict): Default keyword arguments for run.solveMazeFile.
+    :param memoryMB (int): Address space the worker may use, 0 for no limit.
+    """
+    scratch = tempfile.mkdtemp(prefix="unavmaze-")
+    try:
+        solveUpload(scratch, WARMUP_MAZE.encode(), options, True) # imports the solver and renderer and loads the font
+        limitMemory(memoryMB)
+        while True:
+            task = connection.recv()
+            if task is None:
+                return
+            body, overrides, wantImage = task
+            try:
+                result, image = solveUpload(scratch, body, {**options, **overrides}, wantImage)
+                status = "solved" if result["solved"] else "unsolved"
+            except MemoryError:
+                connection.send(("memory", "Ran out of memory, the limit is " + str(memoryMB) + " MB.", None, None))
+                return # the worker may be left in a bad state, so it is replaced
+            except Exception as error: # one broken maze must not take down the worker
+                status, result, image = "failed", {"message": type(error).__name__ + ": " + str(error)}, None
+            connection.send((status, result["message"], result if status != "failed" else None, image))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def solveUpload(scratch, body, options, wantImage):
+    """
+    Writes an uploaded maze to an empty input folder and solves it into an empty output folder.
+    :return: result (dict, see run.runPipeline), image (PNG bytes, or None if not wanted or not drawn)
+    """
+    inputFolder, outputFolder = join(scratch, "input"), join(scratch, "output")
+    for folder in (inputFolder, outputFolder):
+        shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(folder)
+    completeName = join(inputFolder, uploadName(body))
+    with open(completeName, "wb") as file:
+        file.write(body)
+    result = run.solveMazeFile(completeName, outputFolder, **options)
+    image = None
+    if wantImage and result["solved"]:
+        with open(join(outputFolder, "mazeImage.png"), "rb") as file:
+            image = file.read()
+    return result, image
+
+class SolverService:
+    """
+    An HTTP service that solves uploaded mazes with a pool of warm worker processes.
+    Requests wait in a queue of queueSize, and get 503 when it is full, so a burst never piles up more work than the workers
+    can catch up on. A request that takes longer than timeout seconds, or a worker that runs out of memory, has its worker
+    killed and replaced.
+    :param workers (int): Number of worker processes. Default is the number of CPUs.
+    :param queueSize (int): Requests that may wait for a worker.
+    :param timeout (float): Seconds each request may take.
+    :param memoryMB (int): Address space each worker may use, 0 for no limit.
+    :param options (dict): Keyword arguments for run.solveMazeFile. Default is run.optionsFromEnvironment().
+    """
+    def __init__(self, workers=None, queueSize=QUEUE_SIZE, timeout=TIMEOUT, memoryMB=MEMORY_MB, options=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queueSize = queueSize
+        self.timeout = timeout
+        self.memoryMB = memoryMB
+        self.options = options if options is not None else run.optionsFromEnvironment()
+        self.pool = []
+        self.queue = None
+        self.waiters = None
+        self.slots = []
+        self.served = 0
+        self.rejected = 0
+
+    async def start(self, host, port):
+        """
+        Starts the workers and listens for requests.
+        :return: asyncio.Server
+        """
+        self.queue = asyncio.Queue(self.queueSize)
+        self.pool = [startWorker(serviceWorker, self.options, self.memoryMB) for _ in range(self.workers)]
+        self.waiters = ThreadPoolExecutor(self.workers) # waits on the worker pipes without blocking the event loop
+        self.slots = [asyncio.create_task(self.serveSlot(slot)) for slot in range(self.workers)]
+        return await asyncio.start_server(self.handleConnection, host, port)
+
+    def stop(self):
+        for task in self.slots:
+            task.cancel()
+        for worker, connection in self.pool:
+            worker.kill()
+            worker.join()
+        self.waiters.shutdown(wait=False)
+
+    async def serveSlot(self, slot):
+        """
+        Feeds one worker the queued requests, one at a time.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            task, future = await self.queue.get()
+            worker, connection = self.pool[slot]
+            startTime = perf_counter()
+            try:
+                connection.send(task)
+                ready = await loop.run_in_executor(self.waiters, connection.poll, self.timeout)
+                if ready:
+                    reply = connection.recv()
+                    if reply[0] == "memory": # the worker gave up after running out of memory
+                        worker.join()
+                        reply = ("failed",) + reply[1:]
+                        self.pool[slot] = startWorker(serviceWorker, self.options, self.memoryMB)
+                else:
+                    worker.kill()
+                    worker.join()
+                    reply = ("timeout", "Took longer than " + str(self.timeout) + " seconds.", None, None)
+                    self.pool[slot] = startWorker(serviceWorker, self.options, self.memoryMB)
+            except (EOFError, OSError): # the worker died, e.g. killed for running out of memory
+                worker.join()
+                reply = ("failed", "Worker exited with code " + str(worker.exitcode), None, None)
+                self.pool[slot] = startWorker(serviceWorker, self.options, self.memoryMB)
+            if not future.done():
+                future.set_result(reply + (perf_counter() - startTime,))
+            self.queue.task_done()
+
+    async def solve(self, body, overrides, wantImage):
+        """
+        Queues a maze for the workers.
+        :return: (status, message, result, image, seconds), or None if the queue is full
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait(((body, overrides, wantImage), future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+        self.served += 1
+        return await future
+
+    async def handleConnection(self, reader, writer):
+        """
+        Answers HTTP/1.1 requests on a connection until the client closes it.
+        """
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    return
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_UPLOAD:
+                    await self.respond(writer, 413, {"message": "Mazes may be at most " + str(MAX_UPLOAD) + " bytes."}, close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+                method, target = requestLine.decode("latin-1").split()[:2]
+                close = headers.get("connection", "").lower() == "close"
+                status, content = await self.route(method, target, body)
+                await self.respond(writer, status, content, close)
+                if close:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            return
+        finally:
+            writer.close()
+
+    async def route(self, method, target, body):
+        """
+        POST /solve with a maze file as the body solves it. The query string picks what is returned, output=path (default)
+        for JSON, image for the PNG, or both for JSON with the PNG in base64, and can set solver, walls and query the same as
+        the UNAVMAZE_SOLVER, UNAVMAZE_WALLS and UNAVMAZE_QUERY environment variables.
+        GET /health reports the workers and the queue.
+        :return: (HTTP status, dict for a JSON body or bytes for a PNG body)
+        """
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"workers": self.workers, "queued": self.queue.qsize(), "queueSize": self.queueSize,
+                         "served": self.served, "rejected": self.rejected}
+        if url.path != "/solve":
+            return 404, {"message": "Unknown path " + url.path + ", expected /solve or /health."}
+        if method != "POST":
+            return 405, {"message": "Send the maze file with POST."}
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        output = params.get("output", "path")
+        if output not in OUTPUTS:
+            return 400, {"message": "Unknown output " + output + ", expected one of " + ", ".join(OUTPUTS) + "."}
+        overrides = dict()
+        if "solver" in params:
+            overrides["solver"] = params["solver"]
+        if "walls" in params:
+            overrides["pruneWalls"] = params["walls"] == "impassable"
+        if "query" in params:
+            overrides["query"] = params["query"]
+        try:
+            run.checkOptions(walls=params.get("walls", "weighted"), **overrides)
+        except ValueError as error:
+            return 400, {"message": str(error)}
+        reply = await self.solve(body, overrides, output != "path")
+        if reply is None:
+            return 503, {"message": "Too many mazes are waiting, try again later."}
+        status, message, result, image, seconds = reply
+        if status in ("failed", "timeout"):
+            return (504 if status == "timeout" else 500), {"status": status, "message": message.strip()}
+        content = {"status": status, "solved": result["solved"], "message": message, "path": result["path"],
+                   "mode": result["mode"], "expanded": result["expanded"],
+                   "abstractNodes": result.get("abstractNodes"), "seconds": round(seconds, 4)}
+        if output == "image":
+            return (200, image) if image is not None else (422, content)
+        if output == "both" and image is not None:
+            content["image"] = base64.b64encode(image).decode("ascii")
+        return 200, content
+
+    async def respond(self, writer, status, content, close=False):
+        if isinstance(content, bytes):
+            body, contentType = content, "image/png"
+        else:
+            body, contentType = json.dumps(content).encode(), "application/json"
+        head = ("HTTP/1.1 " + str(status) + " " + REASONS[status] + "\r\nContent-Type: " + contentType +
+                "\r\nContent-Length: " + str(len(body)) + "\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        if close:
+            head += "Connection: close\r\n"
+        writer.write((head + "\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(host, port, **settings):
+    service = SolverService(**settings)
+    server = await service.start(host, port)
+    print("Solving mazes on http://" + host + ":" + str(port) + "/solve with " + str(service.workers) + " workers.", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.stop()
+
+###
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve mazes over HTTP with warm worker processes.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--queue", type=int, default=QUEUE_SIZE, help="requests that may wait for a worker (default: " + str(QUEUE_SIZE) + ")")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds each request may take (default: " + str(TIMEOUT) + ")")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="memory each worker may use, 0 for no limit (default: " + str(MEMORY_MB) + ")")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, queueSize=args.queue, timeout=args.timeout, memoryMB=args.memory_mb))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,470 @@
+from heapq import heappush, heappop
+import numpy as np
+
+MAX_HEURISTIC_GOALS = 16 # Searches for more goals than this run without a heuristic
+
+###
+
+class SearchResult:
+    """
+    The outcome of a grid search.
+    :param path (list): (row, col) of every cell from the start point to the end point, or None if there is no path.
+    :param cost (int): The total weight of the path, which is the sum of the weights of every cell entered, or None if there is no path.
+    :param expanded (int): The number of cells taken off the frontier.
+    :param frontier (int): The most entries the frontier held at once, or None if the search does not count them.
+    :param abstractNodes (int): The number of abstract graph nodes an HPA* search expanded before refining its route, or None.
+    """
+    def __init__(self, path, cost, expanded, frontier=None, abstractNodes=None):
+        self.path = path
+        self.cost = cost
+        self.expanded = expanded
+        self.frontier = frontier
+        self.abstractNodes = abstractNodes
+
+    @property
+    def found(self):
+        return self.path is not None
+
+class SearchGrids:
+    """
+    The grids of a maze prepared once for answering many searches on it, such as the queries of queries.py.
+    Searches given them read the weights and walls in place instead of copying them, and keep their state only for the
+    cells they reach, so a short search on a large maze takes as long as the cells it looks at rather than the whole maze.
+    The maze must not change while they are used.
+    :param maze (Maze): The maze to search.
+    :param jumps (dict): The grids of jumpGrids, for jumpPointSearch, built with the same pruneWalls as the searches.
+    Default is none, and jumpPointSearch builds its own.
+    """
+    def __init__(self, maze, jumps=None):
+        self.weights = flatView(maze.weights)
+        self.walls = flatView(maze.walls)
+        self.minWeight = max(int(maze.weights.min()), 0) if maze.weights.size else 0
+        self.jumps = {name: flatView(grid) for name, grid in jumps.items()} if jumps is not None else None
+
+class SparseGrid(dict):
+    """
+    Search state for the cells a search reached, by flat index. Every other cell reads as the default, or as its value in base.
+    """
+    def __init__(self, default=None, base=None):
+        super().__init__()
+        self.default = default
+        self.base = base
+
+    def __missing__(self, index):
+        return self.default if self.base is None else self.base[index]
+
+def flatView(grid):
+    """
+    A flat view of a grid that reads one cell at a time as a Python value, without copying the grid.
+    """
+    return memoryview(np.ascontiguousarray(grid).reshape(-1))
+
+def noPath(expanded=0, frontier=None):
+    """
+    The result of a search that could not reach the end point.
+    :param expanded (int): The number of cells taken off the frontier before giving up.
+    :param frontier (int): The most entries the frontier held at once.
+    :return: SearchResult
+    """
+    return SearchResult(None, None, expanded, frontier)
+
+def flatNeighbors(index, rows, cols):
+    """
+    Gets the flat indices of the up, left, down and right neighbors of a cell.
+    :param index (int): Flat index of the cell (row*cols+col).
+    :param rows: Number of rows in the maze.
+    :param cols: Number of cols in the maze.
+    :return: list of flat indices
+    """
+    row, col = divmod(index, cols)
+    neighbors = []
+    if row != 0:
+        neighbors.append(index-cols)
+    if col != 0:
+        neighbors.append(index-1)
+    if row != rows-1:
+        neighbors.append(index+cols)
+    if col != cols-1:
+        neighbors.append(index+1)
+    return neighbors
+
+def isEnclosed(index, walls, rows, cols):
+    """
+    Checks if every neighbor of a cell is a wall.
+    :param index (int): Flat index of the cell.
+    :param walls: Flat sequence of wall flags.
+    :param rows: Number of rows in the maze.
+    :param cols: Number of cols in the maze.
+    :return: bool
+    """
+    return all(walls[nextIndex] for nextIndex in flatNeighbors(index, rows, cols))
+
+def tracePath(parents, endIndex, cols):
+    """
+    Walks parent links back from the end point.
+    :param parents (list): Flat index of the cell each cell was reached from, or -1 for the start point.
+    :param endIndex (int): Flat index of the end point.
+    :param cols: Number of cols in the maze.
+    :return: list of (row, col) from the start point to the end point
+    """
+    path = []
+    index = endIndex
+    while index != -1:
+        path.append(divmod(index, cols))
+        index = parents[index]
+    path.reverse()
+    return path
+
+def searchGrid(maze, sources, goals, pruneWalls=False, stopAfter=None, grids=None):
+    """
+    A* from one or more sources towards one or more goals over flat cell indices, without building a graph.
+    Moving into a cell costs the weight of that cell, the same as the edges from listToNetworkXGraph.
+    Every source starts with a cost of 0, so each cell is reached from its nearest source.
+    The heuristic is the Manhattan distance to the nearest goal scaled by the smallest cell weight. It is consistent,
+    so a cell taken off the frontier already has its lowest cost, whichever goal it leads to. Ties go to the cell with the
+    highest cost so far, the one furthest along, so on an open floor the search heads straight for the goal instead of
+    expanding every cell with the same estimate.
+    :param maze (Maze): The maze to search.
+    :param sources (list): (row, col) of every cell the search starts from.
+    :param goals (list): (row, col) of every cell to find.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :param stopAfter (int): Stop once this many goals are settled. Default is all of them.
+    :param grids (SearchGrids): The maze's grids prepared for many searches. Default is to copy them for this search.
+    :return: parents (list), costs (list), settled (dict of goal cell index -> cells expanded when it was settled), expanded (int),
+    peak (int, the most entries the frontier held at once)
+    """
+    rows, cols = maze.shape
+    if grids is not None:
+        weights, minWeight = grids.weights, grids.minWeight
+        closed = SparseGrid(0, grids.walls if pruneWalls else None)
+        costs, parents = SparseGrid(None), SparseGrid(-1)
+    else:
+        weights = maze.weights.ravel().tolist()
+        minWeight = max(int(maze.weights.min()), 0)
+        closed = bytearray(maze.walls.tobytes()) if pruneWalls else bytearray(rows*cols) # walls start out closed so they are never entered
+        costs, parents = [None] * (rows*cols), [-1] * (rows*cols)
+    sourceCells = {row*cols + col for row, col in sources}
+    goalCells = {row*cols + col for row, col in goals}
+    if pruneWalls:
+        if len(sourceCells) == 1 and len(goalCells) == 1 and sourceCells != goalCells:
+            if any(isEnclosed(index, closed, rows, cols) for index in sourceCells | goalCells):
+                return None, None, dict(), 0, 0 # a walled in start or end point can not be reached, so there is nothing to search
+    remaining = len(goalCells) if stopAfter is None else min(stopAfter, len(goalCells))
+    goalPoints = [divmod(index, cols) for index in goalCells]
+    singleGoal = len(goalPoints) == 1
+    if singleGoal:
+        endRow, endCol = goalPoints[0]
+    elif len(goalPoints) > MAX_HEURISTIC_GOALS:
+        minWeight = 0 # the nearest goal costs more to look up than the heuristic saves, so search without one
+
+    def estimate(index):
+        row, col = divmod(index, cols)
+        if singleGoal:
+            return minWeight * (abs(row-endRow) + abs(col-endCol))
+        return minWeight * min(abs(row-goalRow) + abs(col-goalCol) for goalRow, goalCol in goalPoints)
+
+    frontier = []
+    for index in sourceCells:
+        costs[index] = 0
+        heappush(frontier, (estimate(index) if minWeight else 0, 0, index))
+    settled = dict()
+    expanded = 0
+    peak = len(frontier)
+    while frontier and remaining:
+        _, _, index = heappop(frontier)
+        if closed[index]:
+            continue # stale heap entry, the cell was already settled with a lower cost
+        closed[index] = 1
+        expanded += 1
+        if index in goalCells:
+            settled[index] = expanded
+            remaining -= 1
+            if not remaining:
+                break
+        cost = costs[index]
+        for nextIndex in flatNeighbors(index, rows, cols):
+            if closed[nextIndex]:
+                continue
+            nextCost = cost + weights[nextIndex]
+            if costs[nextIndex] is None or nextCost < costs[nextIndex]:
+                costs[nextIndex] = nextCost
+                parents[nextIndex] = index
+                if not minWeight:
+                    heappush(frontier, (nextCost, 0, nextIndex))
+                elif singleGoal:
+                    nextRow, nextCol = divmod(nextIndex, cols)
+                    heappush(frontier, (nextCost + minWeight * (abs(nextRow-endRow) + abs(nextCol-endCol)), -nextCost, nextIndex))
+                else:
+                    heappush(frontier, (nextCost + estimate(nextIndex), -nextCost, nextIndex))
+        if len(frontier) > peak: # the frontier only grows while a cell is expanded, so checking once per cell finds the peak
+            peak = len(frontier)
+    return parents, costs, settled, expanded, peak
+
+def gridAStar(maze, startPoint, endPoint, pruneWalls=False, grids=None):
+    """
+    Finds the shortest path through a maze with A* over flat cell indices, without building a graph.
+    :param maze (Maze): The maze to search.
+    :param startPoint: (row, col) of the start point.
+    :param endPoint: (row, col) of the end point.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :param grids (SearchGrids): The maze's grids prepared for many searches. Default is to copy them for this search.
+    :return: SearchResult, which has no path if the end point can not be reached
+    """
+    return gridAStarGoals(maze, startPoint, [endPoint], pruneWalls, grids)[0]
+
+def gridAStarGoals(maze, startPoint, goals, pruneWalls=False, grids=None):
+    """
+    Finds the shortest path from one start point to each of many goals with a single search,
+    which stops as soon as every goal is settled.
+    :param maze (Maze): The maze to search.
+    :param startPoint: (row, col) of the start point.
+    :param goals (list): (row, col) of every goal.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :param grids (SearchGrids): The maze's grids prepared for many searches. Default is to copy them for this search.
+    :return: list of SearchResult in the same order as goals, where expanded is the number of cells expanded when the goal was settled
+    """
+    parents, costs, settled, expanded, peak = searchGrid(maze, [startPoint], goals, pruneWalls, grids=grids)
+    cols = maze.cols
+    results = []
+    for row, col in goals:
+        index = row*cols + col
+        if index in settled:
+            results.append(SearchResult(tracePath(parents, index, cols), costs[index], settled[index], peak))
+        else:
+            results.append(noPath(expanded, peak))
+    return results
+
+def gridAStarNearest(maze, starts, ends, pruneWalls=False):
+    """
+    Finds the cheapest path from any start point to any end point with a single search seeded from every start point,
+    instead of searching once for every pair.
+    :param maze (Maze): The maze to search.
+    :param starts (list): (row, col) of every start point.
+    :param ends (list): (row, col) of every end point.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :return: SearchResult, whose path runs from the start point it leaves to the nearest end point, or has no path if no end point can be reached
+    """
+    parents, costs, settled, expanded, peak = searchGrid(maze, starts, ends, pruneWalls, stopAfter=1)
+    if not settled:
+        return noPath(expanded, peak)
+    index, = settled
+    return SearchResult(tracePath(parents, index, maze.cols), costs[index], expanded, peak)
+
+def jumpGrids(maze, pruneWalls=False):
+    """
+    The grids Jump Point Search reads, padded with a border of blocked cells so no move needs a bounds check.
+    :param maze (Maze): The maze to search.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :return: dict of "passable", "free" (cells with a weight of 1), "stop" (free cells next to another weight) and "weights"
+    grids of shape (rows+2, cols+2)
+    """
+    rows, cols = maze.shape
+    passableGrid = np.zeros((rows+2, cols+2), dtype=bool)
+    passableGrid[1:-1, 1:-1] = ~maze.walls if pruneWalls else True
+    weightGrid = np.ones((rows+2, cols+2), dtype=maze.weights.dtype)
+    weightGrid[1:-1, 1:-1] = maze.weights
+    freeGrid = passableGrid & (weightGrid == 1)
+    heavyGrid = passableGrid & ~freeGrid
+    nearHeavy = np.zeros_like(heavyGrid)
+    nearHeavy[1:] |= heavyGrid[:-1]
+    nearHeavy[:-1] |= heavyGrid[1:]
+    nearHeavy[:, 1:] |= heavyGrid[:, :-1]
+    nearHeavy[:, :-1] |= heavyGrid[:, 1:]
+    return {"passable": passableGrid, "free": freeGrid, "stop": freeGrid & nearHeavy, "weights": weightGrid}
+
+def jumpPointSearch(maze, startPoint, endPoint, pruneWalls=False, grids=None):
+    """
+    Finds the shortest path through a maze with Jump Point Search for 4-connected grids.
+    Runs of cells with a weight of 1 are crossed in one jump instead of being expanded one by one. A jump stops at the
+    end point, next to any cell with another weight, or where a side cell can no longer be reached as cheaply around it
+    (a forced neighbor). Cells with another weight, and the cells next to them, are expanded in every direction like gridAStar,
+    so the cost is the same as gridAStar's.
+    While moving up or down, a side cell is skipped only when the cell beside the one behind costs 1 too, so going through
+    it instead costs the same. While moving left or right, every cell can still turn up or down, which the jump checks by
+    looking along each column it passes.
+    :param maze (Maze): The maze to search.
+    :param startPoint: (row, col) of the start point.
+    :param endPoint: (row, col) of the end point.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :param grids (SearchGrids): The maze's grids prepared for many searches, with the jumpGrids built with the same pruneWalls.
+    Default is to build them for this search.
+    :return: SearchResult, where expanded is the number of jump points expanded
+    """
+    width = maze.cols + 2 # the grids are padded, see jumpGrids
+    if grids is not None and grids.jumps is not None:
+        jumps, minWeight = grids.jumps, grids.minWeight
+    else:
+        jumps = {name: grid.ravel().tolist() for name, grid in jumpGrids(maze, pruneWalls).items()}
+        minWeight = max(int(maze.weights.min()), 0) if maze.weights.size else 0
+    passable, free, weights = jumps["passable"], jumps["free"], jumps["weights"]
+    stop = jumps["stop"] # free cells next to another weight are always expanded in full
+    startIndex = (startPoint[0]+1)*width + startPoint[1]+1
+    endIndex = (endPoint[0]+1)*width + endPoint[1]+1
+    endRow, endCol = divmod(endIndex, width)
+    if pruneWalls and (not passable[startIndex] or not passable[endIndex]):
+        return noPath()
+
+    def jumpVertical(index, step):
+        while True:
+            index += step
+            if not free[index]:
+                return -1
+            if index == endIndex or stop[index]:
+                return index
+            if (free[index-1] and not free[index-1-step]) or (free[index+1] and not free[index+1-step]):
+                return index
+
+    def jumpHorizontal(index, step):
+        while True:
+            index += step
+            if not free[index]:
+                return -1
+            if index == endIndex or stop[index]:
+                return index
+            if jumpVertical(index, width) != -1 or jumpVertical(index, -width) != -1:
+                return index
+
+    def estimate(index):
+        row, col = divmod(index, width)
+        return minWeight * (abs(row-endRow) + abs(col-endCol))
+
+    # A state is a cell and the direction it was reached in (0 for no direction), since that decides which moves are pruned
+    costs = {(startIndex, 0): 0}
+    parents = {(startIndex, 0): None}
+    closed = set()
+    frontier = [(estimate(startIndex), 0, startIndex, 0)] # ties go to the state furthest along, which reaches the end point sooner
+    expanded = 0
+    peak = 1
+    while frontier:
+        _, negativeCost, index, direction = heappop(frontier)
+        cost = -negativeCost
+        state = (index, direction)
+        if state in closed:
+            continue
+        closed.add(state)
+        expanded += 1
+        if index == endIndex:
+            path = []
+            while state is not None:
+                path.append(state[0])
+                state = parents[state]
+            path.reverse()
+            cells = [path[0]]
+            for jumpPoint in path[1:]: # fill in the cells each jump passed over
+                step = 1 if jumpPoint - cells[-1] > 0 else -1
+                if abs(jumpPoint - cells[-1]) >= width:
+                    step *= width
+                cells.extend(range(cells[-1]+step, jumpPoint+step, step))
+            return SearchResult([(index // width - 1, index % width - 1) for index in cells], cost, expanded, peak)
+        if direction == 0 or stop[index] or not free[index]:
+            moves = (-width, -1, width, 1)
+        elif direction in (-1, 1):
+            moves = (direction, -width, width)
+        else:
+            moves = [direction] + [side for side in (-1, 1) if free[index+side] and not free[index+side-direction]]
+        for move in moves:
+            nextIndex = index + move
+            if not passable[nextIndex]:
+                continue
+            if not free[nextIndex]:
+                nextCost = cost + weights[nextIndex]
+            else:
+                if nextIndex != endIndex and not stop[nextIndex]:
+                    nextIndex = jumpHorizontal(index, move) if move in (-1, 1) else jumpVertical(index, move)
+                    if nextIndex == -1:
+                        continue
+                nextCost = cost + (nextIndex - index) // move # every cell jumped over costs 1
+            nextState = (nextIndex, move if free[nextIndex] and not stop[nextIndex] else 0) # fully expanded cells need no direction
+            if nextState not in costs or nextCost < costs[nextState]:
+                costs[nextState] = nextCost
+                parents[nextState] = state
+                heappush(frontier, (nextCost + estimate(nextIndex), -nextCost) + nextState)
+        if len(frontier) > peak:
+            peak = len(frontier)
+    return noPath(expanded, peak)
+
+def bidirectionalSearch(maze, startPoint, endPoint, pruneWalls=False, grids=None):
+    """
+    Finds the shortest path through a maze by searching forward from the start point and backward from the end point at once.
+    Moving into a cell costs the weight of that cell, so the costs are not the same both ways: the forward search pays the
+    weight of every cell it enters, and the backward search pays the weight of every cell it leaves.
+    Both searches are guided by the same potential, half the difference of the Manhattan estimates to the end point and from
+    the start point (scaled by the smallest cell weight), which is consistent for either direction. A cell's key is then its
+    cost plus the potential going forward and minus it going backward, so keys are doubled to stay integers.
+    mu is the cost of the cheapest path found so far through a cell both searches have reached. Every path left to find has
+    to go through a cell on both frontiers, so the search stops once the lowest keys of the two frontiers add up to mu.
+    With no heuristic (a smallest weight of 0) this is the stopping rule of bidirectional Dijkstra.
+    :param maze (Maze): The maze to search.
+    :param startPoint: (row, col) of the start point.
+    :param endPoint: (row, col) of the end point.
+    :param pruneWalls (bool): Whether walls are left out of the search instead of costing WALL_WEIGHT. Default is False.
+    :param grids (SearchGrids): The maze's grids prepared for many searches. Default is to copy them for this search.
+    :return: SearchResult, where expanded counts the cells expanded by both searches and frontier the entries on both frontiers
+    """
+    rows, cols = maze.shape
+    startIndex = startPoint[0]*cols + startPoint[1]
+    endIndex = endPoint[0]*cols + endPoint[1]
+    if grids is not None: # forward, backward
+        weights, minWeight = grids.weights, grids.minWeight
+        closed = [SparseGrid(0, grids.walls if pruneWalls else None) for _ in range(2)]
+        costs = [SparseGrid(None), SparseGrid(None)]
+        parents = [SparseGrid(-1), SparseGrid(-1)]
+    else:
+        weights = maze.weights.ravel().tolist()
+        minWeight = max(int(maze.weights.min()), 0) if maze.weights.size else 0
+        closed = [bytearray(maze.walls.tobytes()) if pruneWalls else bytearray(rows*cols) for _ in range(2)]
+        costs = [[None] * (rows*cols), [None] * (rows*cols)]
+        parents = [[-1] * (rows*cols), [-1] * (rows*cols)]
+    if closed[0][startIndex] or closed[1][endIndex]:
+        return noPath()
+    startRow, startCol = startPoint
+    endRow, endCol = endPoint
+
+    def potential(index):
+        row, col = divmod(index, cols)
+        return minWeight * (abs(row-endRow) + abs(col-endCol) - abs(row-startRow) - abs(col-startCol))
+
+    costs[0][startIndex] = 0
+    costs[1][endIndex] = 0
+    frontiers = [[(potential(startIndex), startIndex)], [(-potential(endIndex), endIndex)]]
+    best = 0 if startIndex == endIndex else None # mu
+    meet = startIndex if startIndex == endIndex else -1
+    expanded = 0
+    peak = 2
+    while True:
+        for side in (0, 1):
+            frontier = frontiers[side]
+            while frontier and closed[side][frontier[0][1]]:
+                heappop(frontier) # stale heap entry, the cell was already settled with a lower cost
+        if not frontiers[0] or not frontiers[1]:
+            break
+        if best is not None and frontiers[0][0][0] + frontiers[1][0][0] >= 2*best:
+            break
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1 # grow the smaller frontier
+        _, index = heappop(frontiers[side])
+        closed[side][index] = 1
+        expanded += 1
+        ownCosts, otherCosts = costs[side], costs[1-side]
+        cost = ownCosts[index]
+        sign = -1 if side else 1
+        for nextIndex in flatNeighbors(index, rows, cols):
+            if closed[side][nextIndex]:
+                continue
+            nextCost = cost + (weights[index] if side else weights[nextIndex])
+            if ownCosts[nextIndex] is None or nextCost < ownCosts[nextIndex]:
+                ownCosts[nextIndex] = nextCost
+                parents[side][nextIndex] = index
+                heappush(frontiers[side], (2*nextCost + sign*potential(nextIndex), nextIndex))
+                if otherCosts[nextIndex] is not None and (best is None or nextCost + otherCosts[nextIndex] < best):
+                    best = nextCost + otherCosts[nextIndex]
+                    meet = nextIndex
+        if len(frontiers[0]) + len(frontiers[1]) > peak:
+            peak = len(frontiers[0]) + len(frontiers[1])
+    if best is None:
+        return noPath(expanded, peak)
+    path = tracePath(parents[0], meet, cols)
+    index = parents[1][meet]
+    while index != -1:
+        path.append(divmod(index, cols))
+        index = parents[1][index]
+    return SearchResult(path, best, expanded, peak)
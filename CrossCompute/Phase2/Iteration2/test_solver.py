@@ -0,0 +1,89 @@
+import random
+import pytest
+from generate import generateMaze
+from maze import rowsToMaze
+from solver import SearchGrids, bidirectionalSearch, gridAStar, jumpGrids, jumpPointSearch
+
+# The searches are checked against gridAStar on seeded random mazes, so a failure can be replayed from its seed
+SEEDS = range(300)
+CELL_TEXTS = ["", "", "", "W", "0", "1", "2", "3", "17"]
+
+###
+
+def randomMaze(rng, wallShare):
+    """
+    Builds a small random maze of blank, wall and weighted cells, with a random start and end point.
+    :param rng (random.Random): The seeded generator.
+    :param wallShare (float): The share of cells that are walls, on top of the walls among CELL_TEXTS.
+    :return: Maze, startPoint, endPoint
+    """
+    rows, cols = rng.randint(1, 25), rng.randint(1, 25)
+    cells = [["W" if rng.random() < wallShare else rng.choice(CELL_TEXTS) for _ in range(cols)] for _ in range(rows)]
+    maze = rowsToMaze(cells)
+    return maze, (rng.randrange(rows), rng.randrange(cols)), (rng.randrange(rows), rng.randrange(cols))
+
+def checkPath(maze, result, startPoint, endPoint, pruneWalls):
+    """
+    Checks that a path found by a search is a walk of neighboring cells from the start to the end point that costs what
+    the search reported.
+    """
+    path = result.path
+    assert path[0] == tuple(startPoint) and path[-1] == tuple(endPoint)
+    assert all(abs(a[0]-b[0]) + abs(a[1]-b[1]) == 1 for a, b in zip(path, path[1:]))
+    assert sum(int(maze.weights[point]) for point in path[1:]) == result.cost
+    if pruneWalls:
+        assert not any(maze.walls[point] for point in path[1:-1])
+
+def compareSearch(search, maze, startPoint, endPoint, pruneWalls, grids=None):
+    """
+    Checks that a search finds a path of the same cost as gridAStar, or none when gridAStar finds none.
+    """
+    expected = gridAStar(maze, startPoint, endPoint, pruneWalls)
+    result = search(maze, startPoint, endPoint, pruneWalls, grids=grids)
+    assert result.cost == expected.cost
+    assert result.found == expected.found
+    if result.found:
+        checkPath(maze, result, startPoint, endPoint, pruneWalls)
+
+@pytest.mark.parametrize("pruneWalls", [False, True])
+def test_jumpPointSearch_matches_gridAStar(pruneWalls):
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        maze, startPoint, endPoint = randomMaze(rng, wallShare=(0.0, 0.1, 0.3)[seed % 3])
+        compareSearch(jumpPointSearch, maze, startPoint, endPoint, pruneWalls)
+        compareSearch(jumpPointSearch, maze, startPoint, endPoint, pruneWalls, SearchGrids(maze, jumpGrids(maze, pruneWalls)))
+
+@pytest.mark.parametrize("pruneWalls", [False, True])
+@pytest.mark.parametrize("kind", ["perfect", "rooms", "terrain", "unsolvable"])
+def test_jumpPointSearch_matches_gridAStar_on_generated_mazes(kind, pruneWalls):
+    for seed in range(5):
+        maze = generateMaze(kind, 41, 53, seed)
+        grids = SearchGrids(maze, jumpGrids(maze, pruneWalls)) # shared by every search on the maze, as in queries.py
+        rng = random.Random(seed)
+        points = [maze.starts[0], maze.ends[0]] + [(rng.randrange(maze.rows), rng.randrange(maze.cols)) for _ in range(6)]
+        for startPoint, endPoint in zip(points, points[1:]):
+            compareSearch(jumpPointSearch, maze, startPoint, endPoint, pruneWalls, grids)
+
+@pytest.mark.parametrize("pruneWalls", [False, True])
+def test_bidirectionalSearch_matches_gridAStar(pruneWalls):
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        maze, startPoint, endPoint = randomMaze(rng, wallShare=(0.0, 0.2, 0.45)[seed % 3]) # many are unsolvable with impassable walls
+        grids = SearchGrids(maze)
+        compareSearch(bidirectionalSearch, maze, startPoint, endPoint, pruneWalls)
+        compareSearch(bidirectionalSearch, maze, startPoint, endPoint, pruneWalls, grids)
+        row, col = startPoint
+        for nextPoint in ((row-1, col), (row+1, col), (row, col-1), (row, col+1), startPoint): # end points next to the start point, and on it
+            if 0 <= nextPoint[0] < maze.rows and 0 <= nextPoint[1] < maze.cols:
+                compareSearch(bidirectionalSearch, maze, startPoint, nextPoint, pruneWalls, grids)
+
+@pytest.mark.parametrize("pruneWalls", [False, True])
+@pytest.mark.parametrize("kind", ["perfect", "rooms", "terrain", "unsolvable"])
+def test_bidirectionalSearch_matches_gridAStar_on_generated_mazes(kind, pruneWalls):
+    for seed in range(5):
+        maze = generateMaze(kind, 41, 53, seed)
+        grids = SearchGrids(maze)
+        rng = random.Random(seed)
+        points = [maze.starts[0], maze.ends[0]] + [(rng.randrange(maze.rows), rng.randrange(maze.cols)) for _ in range(6)]
+        for startPoint, endPoint in zip(points, points[1:]):
+            compareSearch(bidirectionalSearch, maze, startPoint, endPoint, pruneWalls, grids)
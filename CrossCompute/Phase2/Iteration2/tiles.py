@@ -0,0 +1,151 @@
+import os
+import shutil
+from math import ceil
+from multiprocessing import Pool, current_process
+from os.path import join
+from PIL import Image
+from render import renderImage, labelWeights, getMinAndMax
+
+TILE_SIZE = 256 # Width and height of a tile in pixels
+PIXEL_BUDGET = 8192 * 8192 # Largest image written in one piece: a whole maze image in "auto" mode, or the overview of a pyramid
+PYRAMID_NAME = "mazeImage" # The pyramid is mazeImage.dzi with its tiles in mazeImage_files/<level>/<col>_<row>.png
+
+workerJob = None # The drawing a tile worker process renders tiles of
+
+###
+
+class PyramidJob:
+    """
+    Everything needed to render any tile of a Deep Zoom pyramid of a maze image.
+    Level maxLevel is the full size image, and every level below it is half the size of the one above, down to 1 x 1 pixel.
+    :param maze (Maze): The maze to draw.
+    :param pathMask: Boolean grid of path cells.
+    :param scale: The width and height of each cell in pixels at full size.
+    :param folder: The folder the tiles are written to, mazeImage_files.
+    :param minAndMax: The (min, max) weights to color with. Default is getMinAndMax of the maze.
+    """
+    def __init__(self, maze, pathMask, scale, folder, minAndMax=None):
+        self.maze = maze
+        self.pathMask = pathMask
+        self.scale = scale
+        self.folder = folder
+        self.minAndMax = minAndMax if minAndMax is not None else getMinAndMax(maze, pathMask)
+        self.width = maze.cols * scale
+        self.height = maze.rows * scale
+        self.maxLevel = (max(self.width, self.height, 1) - 1).bit_length() # the first level big enough for the image
+        labels = [len(str(int(maze.weights.max())))] + [len(name) for name in maze.endNames.values()]
+        self.labelCells = ceil(max(labels) * .75) + 1 # how many cells to the right a label can reach
+
+    def levelSize(self, level):
+        shrink = 2 ** (self.maxLevel - level)
+        return ceil(self.width / shrink), ceil(self.height / shrink)
+
+    def tileCounts(self, level):
+        width, height = self.levelSize(level)
+        return ceil(width / TILE_SIZE), ceil(height / TILE_SIZE)
+
+    def tileName(self, level, col, row):
+        return join(self.folder, str(level), str(col) + "_" + str(row) + ".png")
+
+    def renderTile(self, col, row):
+        """
+        Draws a full size tile from the cells under it. Labels can reach past their cell, so a margin of cells around the
+        tile is drawn too and cut off again.
+        :return: PIL image
+        """
+        maze, scale = self.maze, self.scale
+        left, top = col * TILE_SIZE, row * TILE_SIZE
+        right, bottom = min(left + TILE_SIZE, self.width), min(top + TILE_SIZE, self.height)
+        firstRow, lastRow = max(top // scale - 1, 0), min((bottom - 1) // scale + 2, maze.rows)
+        firstCol, lastCol = max(left // scale - self.labelCells, 0), min((right - 1) // scale + 2, maze.cols)
+        part = maze.crop(firstRow, lastRow, firstCol, lastCol)
+        partMask = self.pathMask[firstRow:lastRow, firstCol:lastCol]
+        img = renderImage(part, partMask, scale, self.minAndMax)
+        labelWeights(img, part, partMask, scale)
+        x, y = firstCol * scale, firstRow * scale
+        return img.crop((left - x, top - y, right - x, bottom - y))
+
+    def shrinkTile(self, level, col, row):
+        """
+        Draws a tile of a lower level by halving the (up to) four tiles above it.
+        :return: PIL image
+        """
+        cols, rows = self.tileCounts(level + 1)
+        children = [[Image.open(self.tileName(level + 1, childCol, childRow)) for childCol in range(2*col, min(2*col + 2, cols))]
+                    for childRow in range(2*row, min(2*row + 2, rows))]
+        width = sum(child.width for child in children[0])
+        height = sum(childRow[0].height for childRow in children)
+        img = Image.new("RGB", (width, height))
+        for childRow in range(len(children)):
+            for childCol in range(len(children[0])):
+                with children[childRow][childCol] as child:
+                    img.paste(child, (childCol * TILE_SIZE, childRow * TILE_SIZE))
+        return img.reduce(2)
+
+    def writeTile(self, level, col, row):
+        img = self.renderTile(col, row) if level == self.maxLevel else self.shrinkTile(level, col, row)
+        img.save(self.tileName(level, col, row))
+
+def startTileWorker(job):
+    global workerJob
+    workerJob = job
+
+def tileWorker(tile):
+    workerJob.writeTile(*tile)
+
+def writePyramid(maze, pathMask, scale, folder, workers=None, pixelBudget=PIXEL_BUDGET, minAndMax=None):
+    """
+    Writes a maze image as a Deep Zoom pyramid of TILE_SIZE tiles, mazeImage.dzi and mazeImage_files, one tile at a time,
+    so memory stays bounded however big the image is. The tiles of each level are drawn in parallel.
+    The largest level that fits in pixelBudget is also written as mazeImage.png, an overview of the whole maze.
+    :param maze (Maze): The maze to draw.
+    :param pathMask: Boolean grid of path cells.
+    :param scale: The width and height of each cell in pixels at full size.
+    :param folder: The output folder.
+    :param workers (int): Number of worker processes. Default is the number of CPUs, or 1 inside a daemon process
+    (such as a batch worker), which is not allowed to start processes of its own.
+    :param pixelBudget (int): Most pixels the overview may have.
+    :param minAndMax: The (min, max) weights to color with, see PyramidJob.
+    :return: list of the names written to folder
+    """
+    tileFolder = join(folder, PYRAMID_NAME + "_files")
+    shutil.rmtree(tileFolder, ignore_errors=True) # tiles of a bigger maze drawn here before must not linger
+    job = PyramidJob(maze, pathMask, scale, tileFolder, minAndMax)
+    for level in range(job.maxLevel + 1):
+        os.makedirs(join(tileFolder, str(level)))
+    workers = 1 if current_process().daemon else workers or os.cpu_count() or 1
+    levels = range(job.maxLevel, -1, -1) # each level is drawn from the one above it
+    if workers == 1:
+        for level in levels:
+            cols, rows = job.tileCounts(level)
+            for row in range(rows):
+                for col in range(cols):
+                    job.writeTile(level, col, row)
+    else:
+        with Pool(workers, initializer=startTileWorker, initargs=(job,)) as pool:
+            for level in levels:
+                cols, rows = job.tileCounts(level)
+                tiles = [(level, col, row) for row in range(rows) for col in range(cols)]
+                for _ in pool.imap_unordered(tileWorker, tiles, chunksize=max(1, len(tiles) // (workers * 8))):
+                    pass
+    with open(join(folder, PYRAMID_NAME + ".dzi"), "w") as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="png" Overlap="0" TileSize="' + str(TILE_SIZE) + '">'
+                   '<Size Width="' + str(job.width) + '" Height="' + str(job.height) + '"/></Image>\n')
+    writeOverview(job, join(folder, "mazeImage.png"), pixelBudget)
+    return ["mazeImage.png", PYRAMID_NAME + ".dzi", PYRAMID_NAME + "_files"]
+
+def writeOverview(job, completeName, pixelBudget=PIXEL_BUDGET):
+    """
+    Stitches the tiles of the largest level that fits in pixelBudget into one image.
+    """
+    level = job.maxLevel
+    while level > 0 and job.levelSize(level)[0] * job.levelSize(level)[1] > pixelBudget:
+        level -= 1
+    cols, rows = job.tileCounts(level)
+    img = Image.new("RGB", job.levelSize(level))
+    for row in range(rows):
+        for col in range(cols):
+            with Image.open(job.tileName(level, col, row)) as tile:
+                img.paste(tile, (col * TILE_SIZE, row * TILE_SIZE))
+    img.save(completeName)